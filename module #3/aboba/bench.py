@@ -0,0 +1,202 @@
+import argparse
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from database import get_manager, close_all
+from core import create_database, import_csv_data, initialize_database, quick_start
+from migrations import run_migrations
+from importer import PARTNER_HEADERS, PRODUCT_HEADERS, SALES_HEADERS
+from partner_model import PartnerPageModel
+
+SCALES = {'1k': 1000, '100k': 100000, '10m': 10000000}
+DEFAULT_SCALES = ('1k', '100k')
+RESULTS_FILE = 'bench_results.json'
+SEED = 20240601
+WRITE_CHUNK = 10000
+
+PARTNER_TYPES = ['ЗАО', 'ООО', 'ПАО', 'ОАО']
+STREETS = ['Ленина', 'Мира', 'Садовая', 'Школьная', 'Лесная', 'Новая', 'Советская']
+FIRST_DATE = datetime.date(2020, 1, 1)
+DATE_SPAN_DAYS = 5 * 365
+
+
+def scale_counts(sales_rows):
+    # Partners and products grow with the sales table so per-partner history
+    # and catalog size stay in a realistic ratio at every scale.
+    return max(10, sales_rows // 100), max(10, sales_rows // 1000), sales_rows
+
+
+def write_rows(path, headers, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= WRITE_CHUNK:
+                writer.writerows(chunk)
+                chunk = []
+        writer.writerows(chunk)
+
+
+def partner_rows(rng, count):
+    for i in range(1, count + 1):
+        yield (f"Партнер {i}", rng.choice(PARTNER_TYPES), rng.randint(0, 10),
+               f"г. Москва, ул. {rng.choice(STREETS)}, д. {rng.randint(1, 200)}",
+               f"Директор {rng.randint(1, count)}", f"+7 9{rng.randint(0, 999999999):09d}",
+               f"partner{i}@example.com")
+
+
+def product_rows(rng, count):
+    for i in range(1, count + 1):
+        yield (f"Продукция {i}", rng.randint(1, 2), round(rng.uniform(0.5, 10.0), 2),
+               round(rng.uniform(0.5, 10.0), 2))
+
+
+def sale_rows(rng, count, partners, products):
+    for _ in range(count):
+        sale_date = FIRST_DATE + datetime.timedelta(days=rng.randrange(DATE_SPAN_DAYS))
+        yield (rng.randint(1, partners), rng.randint(1, products), rng.randint(1, 1000), sale_date.isoformat())
+
+
+def generate_csv(csv_dir, sales_rows, seed=SEED):
+    # Deterministic for a given (sales_rows, seed): ids are 1..N in file order,
+    # which is what AUTOINCREMENT assigns on import into an empty database.
+    partners, products, sales = scale_counts(sales_rows)
+    rng = random.Random(seed)
+    write_rows(os.path.join(csv_dir, 'partners.csv'), PARTNER_HEADERS, partner_rows(rng, partners))
+    write_rows(os.path.join(csv_dir, 'products.csv'), PRODUCT_HEADERS, product_rows(rng, products))
+    write_rows(os.path.join(csv_dir, 'sales.csv'), SALES_HEADERS, sale_rows(rng, sales, partners, products))
+    return {'partners': partners, 'products': products, 'sales': sales}
+
+
+def timed(results, name, fn, *args, **kwargs):
+    started = time.perf_counter()
+    value = fn(*args, **kwargs)
+    results[name] = round(time.perf_counter() - started, 6)
+    return value
+
+
+def list_partners(db_file):
+    model = PartnerPageModel(get_manager(db_file))
+    model.initial_window()
+    model.total_count()
+    return model
+
+
+def sales_by_partner(db_file):
+    return get_manager(db_file).fetchall(
+        "SELECT partner_id, SUM(quantity), MAX(sale_date) FROM sales GROUP BY partner_id")
+
+
+def sales_by_month(db_file):
+    return get_manager(db_file).fetchall(
+        "SELECT substr(sale_date, 1, 7), SUM(quantity) FROM sales GROUP BY 1 ORDER BY 1")
+
+
+def sales_by_product_type(db_file):
+    return get_manager(db_file).fetchall('''
+        SELECT pr.product_type_id, SUM(s.quantity) FROM sales s
+        JOIN products pr ON pr.product_id = s.product_id GROUP BY pr.product_type_id
+    ''')
+
+
+def run_scale(label, sales_rows, work_dir, seed=SEED, workers=1):
+    scale_dir = os.path.join(work_dir, label)
+    os.makedirs(scale_dir, exist_ok=True)
+    db_file = os.path.join(scale_dir, 'bench.db')
+    timings = {}
+    counts = timed(timings, 'generate_csv', generate_csv, scale_dir, sales_rows, seed)
+    timed(timings, 'create_database', create_database, db_file)
+    # Same order as the import command: the import writes into the final
+    # schema (indexes, triggers, unique keys), not the bare tables.
+    timed(timings, 'run_migrations', run_migrations, get_manager(db_file))
+    timed(timings, 'import_csv_data', import_csv_data, db_file, csv_dir=scale_dir, workers=workers)
+    # The first startup after an import records the CSV files in
+    # csv_sync_state (hashing them); the second is the steady state, where
+    # nothing is migrated and every file is one stat() call.
+    timed(timings, 'initialize_database_first', initialize_database, db_file, csv_dir=scale_dir)
+    timed(timings, 'initialize_database', initialize_database, db_file, csv_dir=scale_dir)
+    timed(timings, 'quick_start', quick_start, db_file)
+    timed(timings, 'list_partners', list_partners, db_file)
+    timed(timings, 'sales_by_partner', sales_by_partner, db_file)
+    timed(timings, 'sales_by_month', sales_by_month, db_file)
+    timed(timings, 'sales_by_product_type', sales_by_product_type, db_file)
+    close_all()
+    return {
+        'scale': label,
+        'workers': workers,
+        'rows': counts,
+        'db_size_bytes': os.path.getsize(db_file),
+        'timings': timings,
+    }
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_run(path, run):
+    # The file holds every run so far; comparing entries shows regressions.
+    runs = load_results(path)
+    runs.append(run)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(runs, f, ensure_ascii=False, indent=2)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the partners database on synthetic data.")
+    parser.add_argument('--scale', action='append', choices=sorted(SCALES),
+                        help="data size by sales rows; repeatable (default: 1k and 100k)")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--work-dir', help="where to write CSV files and databases (default: temporary)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="import with this many parser processes; 0 uses every core (default: 1)")
+    parser.add_argument('--keep', action='store_true', help="keep the generated files")
+    parser.add_argument('--output', default=RESULTS_FILE,
+                        help=f"JSON file the run is appended to (default: {RESULTS_FILE})")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='partners-bench-')
+    run = {
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': [],
+    }
+    try:
+        for label in args.scale or DEFAULT_SCALES:
+            with redirect_stdout(sys.stderr):
+                result = run_scale(label, SCALES[label], work_dir, args.seed, args.workers or None)
+            run['results'].append(result)
+            print(f"{label}: " + ", ".join(f"{name}={seconds:.3f}s" for name, seconds in result['timings'].items()))
+    finally:
+        close_all()
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    save_run(args.output, run)
+    print(f"Results appended to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import math
+
+# PLACEHOLDER DATA. No source for these figures ships with the project:
+# they are stand-ins for the two product and material types the sample
+# data uses, not real production values. Replace both tables with the
+# plant's figures before using the material calculator for planning.
+#
+# product type id -> material per unit multiplier
+PRODUCT_COEFFICIENTS = {
+    1: 1.5,
+    2: 2.0,
+}
+# material type id -> share of material lost to defects
+MATERIAL_DEFECT_RATES = {
+    1: 0.1,
+    2: 0.2,
+}
+
+# Totals from here up do not fit the int64 the batch version returns, so
+# both versions reject them.
+MATERIAL_LIMIT = 2 ** 63
+
+# (min total quantity, discount %) from the highest tier down. Seeded into
+# the discount_tiers table, where DISCOUNT_SQL looks the discount up.
+DISCOUNT_TIERS = [
+    (300000, 15),
+    (50000, 10),
+    (10000, 5),
+    (0, 0),
+]
+
+
+def calculate_material(product_type_id, material_type_id, quantity, param1, param2):
+    if not all(isinstance(x, (int, float)) for x in [product_type_id, material_type_id, quantity, param1, param2]):
+        return -1
+    if quantity <= 0 or param1 <= 0 or param2 <= 0:
+        return -1
+    if product_type_id not in PRODUCT_COEFFICIENTS or material_type_id not in MATERIAL_DEFECT_RATES:
+        return -1
+    product_coefficient = PRODUCT_COEFFICIENTS[product_type_id]
+    material_per_unit = param1 * param2 * product_coefficient
+    defect_rate = MATERIAL_DEFECT_RATES[material_type_id]
+    total_material = material_per_unit * quantity / (1 - defect_rate)
+    if not total_material < MATERIAL_LIMIT:
+        return -1
+    return math.ceil(total_material)
+
+
+def lookup_table(mapping):
+    # Dense array indexed by id; ids without an entry hold NaN.
+    import numpy as np
+    table = np.full(max(mapping) + 1, np.nan)
+    for key, value in mapping.items():
+        table[key] = value
+    return table
+
+
+def integral_ids(ids):
+    # Ids as int64 plus a mask of the ones that really are integers. A cast
+    # alone would truncate 1.5 to a valid 1, where calculate_material
+    # rejects it.
+    import numpy as np
+    ids = np.asarray(ids, dtype=np.float64)
+    integral = np.isfinite(ids) & (ids == np.floor(ids))
+    return np.where(integral, ids, -1).astype(np.int64), integral
+
+
+def calculate_materials_batch(product_type_ids, material_type_ids, quantities, param1, param2):
+    # Same rules as calculate_material, evaluated for whole arrays at once.
+    # Inputs broadcast, so a (scenarios, products) quantity matrix works
+    # against per-product arrays. Invalid entries come back as -1.
+    import numpy as np
+    product_type_ids, product_integral = integral_ids(product_type_ids)
+    material_type_ids, material_integral = integral_ids(material_type_ids)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    param1 = np.asarray(param1, dtype=np.float64)
+    param2 = np.asarray(param2, dtype=np.float64)
+
+    coefficients = lookup_table(PRODUCT_COEFFICIENTS)
+    defect_rates = lookup_table(MATERIAL_DEFECT_RATES)
+    product_known = product_integral & (product_type_ids >= 0) & (product_type_ids < len(coefficients))
+    material_known = material_integral & (material_type_ids >= 0) & (material_type_ids < len(defect_rates))
+    product_coefficient = coefficients[np.where(product_known, product_type_ids, 0)]
+    defect_rate = defect_rates[np.where(material_known, material_type_ids, 0)]
+
+    valid = (product_known & material_known & ~np.isnan(product_coefficient) & ~np.isnan(defect_rate)
+             & (quantities > 0) & (param1 > 0) & (param2 > 0))
+    with np.errstate(invalid='ignore', over='ignore'):
+        material_per_unit = param1 * param2 * product_coefficient
+        total_material = np.ceil(material_per_unit * quantities / (1 - defect_rate))
+        valid &= total_material < MATERIAL_LIMIT
+    return np.where(valid, total_material, -1).astype(np.int64)
+
+
+def product_catalog_arrays(manager):
+    import numpy as np
+    with manager.reader() as conn:
+        rows = conn.execute(
+            "SELECT product_id, product_type_id, param1, param2 FROM products ORDER BY product_id").fetchall()
+    if not rows:
+        return {name: np.empty(0) for name in ('product_id', 'product_type_id', 'param1', 'param2')}
+    product_id, product_type_id, param1, param2 = zip(*rows)
+    return {
+        'product_id': np.array(product_id, dtype=np.int64),
+        'product_type_id': np.array(product_type_id, dtype=np.float64),
+        'param1': np.array(param1, dtype=np.float64),
+        'param2': np.array(param2, dtype=np.float64),
+    }
+
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+from contextlib import redirect_stdout
+from database import get_manager, close_all
+from core import (create_database, import_csv_data, sync_csv_data, database_stats, calculate_catalog_materials,
+                  open_database, DatabaseNotReadyError)
+from migrations import run_migrations
+from instrumentation import STATS, enable_profiling
+from snapshot import AnalyticsSnapshot
+from exporter import EXPORT_TABLES, FORMATS, export_query, export_table
+
+REPORTS = {
+    'partner': AnalyticsSnapshot.sales_by_partner,
+    'partner-type': AnalyticsSnapshot.sales_by_partner_type,
+    'product-type': AnalyticsSnapshot.sales_by_product_type,
+    'month': AnalyticsSnapshot.sales_by_month,
+}
+
+
+def open_for_reading(args):
+    try:
+        return open_database(args.db)
+    except DatabaseNotReadyError as e:
+        print(f"Error: {str(e)}")
+        return None
+
+
+def print_progress(stats):
+    print(f"  {stats.table}: {stats.rows} rows, {stats.rows_per_second:.0f} rows/s", file=sys.stderr)
+
+
+def cmd_import(args):
+    create_database(args.db)
+    run_migrations(get_manager(args.db))
+    import_csv_data(args.db, csv_dir=args.csv_dir, progress=print_progress if args.progress else None,
+                    rebuild_indexes=args.rebuild_indexes, workers=args.workers)
+    return 0
+
+
+def cmd_sync(args):
+    create_database(args.db)
+    run_migrations(get_manager(args.db))
+    sync_csv_data(args.db, csv_dir=args.csv_dir, progress=print_progress if args.progress else None)
+    return 0
+
+
+def cmd_export(args):
+    manager = open_for_reading(args)
+    if manager is None:
+        return 1
+    filters = {'date_from': args.date_from, 'date_to': args.date_to, 'partner_type': args.partner_type}
+    try:
+        export_query(args.table, **filters)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 2
+    if args.format == 'columnar':
+        out = open(args.output, 'wb') if args.output != '-' else args.stdout.buffer
+    else:
+        out = open(args.output, 'w', encoding='utf-8', newline='') if args.output != '-' else args.stdout
+    try:
+        exported = export_table(manager, args.table, out, args.format, **filters)
+    finally:
+        if args.output != '-':
+            out.close()
+        else:
+            out.flush()
+    print(f"Exported {exported} rows from {args.table}")
+    return 0
+
+
+def cmd_stats(args):
+    if open_for_reading(args) is None:
+        return 1
+    stats = database_stats(args.db)
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2), file=args.stdout)
+    else:
+        for key, value in stats.items():
+            print(f"{key}: {value}", file=args.stdout)
+    return 0
+
+
+def cmd_calc_materials(args):
+    if open_for_reading(args) is None:
+        return 1
+    product_ids, needs = calculate_catalog_materials(args.db, args.material_type, args.quantity)
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output != '-' else args.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(['product_id', 'material_needed'])
+        writer.writerows(zip(product_ids.tolist(), needs.tolist()))
+    finally:
+        if out is not args.stdout:
+            out.close()
+    return 0
+
+
+def cmd_report(args):
+    manager = open_for_reading(args)
+    if manager is None:
+        return 1
+    snapshot = AnalyticsSnapshot(manager).load()
+    writer = csv.writer(args.stdout)
+    writer.writerow([args.group_by, 'quantity'])
+    writer.writerows(REPORTS[args.group_by](snapshot).items())
+    snapshot.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Partners database tools (no GUI).")
+    parser.add_argument('--db', default='partners.db', help="SQLite database file (default: partners.db)")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="profile queries and write timing stats and query plans to FILE as JSON")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="import partners/products/sales CSV files")
+    import_parser.add_argument('--csv-dir', help="directory with the CSV files (default: script directory)")
+    import_parser.add_argument('--rebuild-indexes', action='store_true',
+                               help="drop and rebuild indexes around the load")
+    import_parser.add_argument('--progress', action='store_true', help="print progress to stderr")
+    import_parser.add_argument('--workers', type=int, default=1,
+                               help="parse large files in this many processes; 0 uses every core (default: 1)")
+    import_parser.set_defaults(func=cmd_import)
+
+    sync_parser = commands.add_parser('sync', help="import only new or changed CSV rows, resuming where it stopped")
+    sync_parser.add_argument('--csv-dir', help="directory with the CSV files (default: script directory)")
+    sync_parser.add_argument('--progress', action='store_true', help="print progress to stderr")
+    sync_parser.set_defaults(func=cmd_sync)
+
+    export_parser = commands.add_parser('export', help="export a table to CSV or a columnar file")
+    export_parser.add_argument('table', choices=EXPORT_TABLES)
+    export_parser.add_argument('output', nargs='?', default='-', help="output file (default: stdout)")
+    export_parser.add_argument('--format', choices=FORMATS, default='csv')
+    export_parser.add_argument('--date-from', help="sales only: first sale_date to include (YYYY-MM-DD)")
+    export_parser.add_argument('--date-to', help="sales only: last sale_date to include (YYYY-MM-DD)")
+    export_parser.add_argument('--partner-type', help="partners and sales only: partner type to include")
+    export_parser.set_defaults(func=cmd_export)
+
+    stats_parser = commands.add_parser('stats', help="print database statistics")
+    stats_parser.add_argument('--json', action='store_true', help="print as JSON")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    report_parser = commands.add_parser('report', help="total quantity sold, grouped in memory")
+    report_parser.add_argument('group_by', choices=sorted(REPORTS))
+    report_parser.set_defaults(func=cmd_report)
+
+    calc_parser = commands.add_parser('calc-materials', help="material needs for the whole product catalog")
+    calc_parser.add_argument('--material-type', type=int, required=True)
+    calc_parser.add_argument('--quantity', type=int, default=1, help="units of each product (default: 1)")
+    calc_parser.add_argument('output', nargs='?', default='-', help="output file (default: stdout)")
+    calc_parser.set_defaults(func=cmd_calc_materials)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'workers', 1) == 0:
+        args.workers = None
+    # Status messages from the DB layer go to stderr so that stdout carries
+    # only the command's output and can be piped.
+    args.stdout = sys.stdout
+    if args.profile:
+        enable_profiling()
+    try:
+        with redirect_stdout(sys.stderr):
+            return args.func(args)
+    finally:
+        close_all()
+        if args.profile:
+            STATS.dump(args.profile)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import sqlite3
+import os
+import sys
+from database import get_manager
+from importer import CsvImporter, CsvSync, ParallelCsvImporter
+from migrations import run_migrations, schema_version, LATEST_VERSION
+from instrumentation import timed
+
+def get_script_dir():
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+SCRIPT_DIR = get_script_dir()
+
+def create_database(db_file):
+    try:
+        manager = get_manager(db_file)
+        with manager.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS partners (
+                    partner_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    partner_type TEXT NOT NULL,
+                    rating INTEGER NOT NULL CHECK(rating >= 0),
+                    address TEXT,
+                    director_name TEXT,
+                    phone TEXT,
+                    email TEXT
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS products (
+                    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    product_type_id INTEGER NOT NULL,
+                    param1 REAL NOT NULL CHECK(param1 > 0),
+                    param2 REAL NOT NULL CHECK(param2 > 0)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sales (
+                    sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    partner_id INTEGER NOT NULL,
+                    product_id INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL CHECK(quantity > 0),
+                    sale_date TEXT NOT NULL,
+                    FOREIGN KEY (partner_id) REFERENCES partners(partner_id) ON DELETE RESTRICT,
+                    FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE RESTRICT
+                )
+            ''')
+        manager.schema.invalidate()
+        print(f"Database tables created successfully in {db_file}")
+    except sqlite3.Error as e:
+        print(f"Error creating database tables: {str(e)}")
+        raise
+
+@timed('import_csv_data')
+def import_csv_data(db_file, csv_dir=None, progress=None, rebuild_indexes=False, workers=1):
+    try:
+        if workers == 1:
+            importer = CsvImporter(get_manager(db_file), csv_dir or SCRIPT_DIR, progress=progress,
+                                   rebuild_indexes=rebuild_indexes)
+        else:
+            # workers=None uses every core.
+            importer = ParallelCsvImporter(get_manager(db_file), csv_dir or SCRIPT_DIR, workers=workers,
+                                           progress=progress, rebuild_indexes=rebuild_indexes)
+        results = importer.import_all()
+        print("CSV data imported successfully.")
+        return results
+    except sqlite3.Error as e:
+        print(f"Error importing CSV data: {str(e)}")
+        raise
+    except Exception as e:
+        print(f"General error during CSV import: {str(e)}")
+        raise
+
+@timed('sync_csv_data')
+def sync_csv_data(db_file, csv_dir=None, progress=None):
+    try:
+        results = CsvSync(get_manager(db_file), csv_dir or SCRIPT_DIR, progress=progress).import_all()
+        print("CSV data synced successfully.")
+        return results
+    except sqlite3.Error as e:
+        print(f"Error syncing CSV data: {str(e)}")
+        raise
+    except Exception as e:
+        print(f"General error during CSV sync: {str(e)}")
+        raise
+
+@timed('initialize_database')
+def initialize_database(db_file, csv_dir=None):
+    try:
+        create_database(db_file)
+        manager = get_manager(db_file)
+        run_migrations(manager)
+        prune_partner_changes(manager)
+        counts = row_counts(manager)
+        print(f"Database state: partners={counts['partners']}, products={counts['products']}, "
+              f"sales={counts['sales']}")
+        # Unchanged files cost one stat() each; new or appended rows are
+        # imported and an interrupted import picks up where it stopped.
+        return sync_csv_data(db_file, csv_dir=csv_dir)
+    except sqlite3.Error as e:
+        print(f"Database initialization failed: {str(e)}")
+        raise
+    except Exception as e:
+        print(f"Unexpected error during database initialization: {str(e)}")
+        raise
+
+def read_row_counts(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='table_stats'").fetchone():
+        return dict(conn.execute("SELECT table_name, row_count FROM table_stats").fetchall())
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('partners', 'products', 'sales')}
+
+def row_counts(manager):
+    with manager.reader() as conn:
+        return read_row_counts(conn)
+
+@timed('quick_start')
+def quick_start(db_file):
+    # Returns the cached row counts when the file is already at the current
+    # schema, so the window can show data before initialize_database runs;
+    # None means a full initialization has to come first.
+    if not os.path.exists(db_file):
+        return None
+    manager = get_manager(db_file)
+    if schema_version(manager) < LATEST_VERSION:
+        return None
+    return row_counts(manager)
+
+class DatabaseNotReadyError(Exception):
+    """The database is missing or needs migrations before it can be read."""
+
+def open_database(db_file):
+    # For commands that only read: checks the schema version on a read-only
+    # reader connection. No writer connection is opened, so the file is not
+    # switched to WAL, migrated, pruned or synced.
+    if not os.path.exists(db_file):
+        raise DatabaseNotReadyError(f"{db_file} does not exist; run the import or sync command first")
+    manager = get_manager(db_file)
+    with manager.reader() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < LATEST_VERSION:
+        raise DatabaseNotReadyError(f"{db_file} is at schema version {version}, expected {LATEST_VERSION}; "
+                                    "run the sync command or open the app to migrate it")
+    return manager
+
+def table_exists(db_file, table_name):
+    try:
+        return get_manager(db_file).schema.has_table(table_name)
+    except sqlite3.Error as e:
+        print(f"Error checking table existence: {str(e)}")
+        return False
+
+def load_partner(db_file, partner_id):
+    return get_manager(db_file).fetchone('SELECT * FROM partners WHERE partner_id = ?', (partner_id,))
+
+CHANGE_LOG_RETENTION = '-1 day'
+
+class PartnerConflictError(Exception):
+    """The partner was changed or deleted since the caller loaded it."""
+
+@timed('save_partner_record')
+def save_partner_record(db_file, values, partner_id=None, expected_version=None):
+    # With expected_version the update only applies if nobody saved the
+    # partner in between; otherwise PartnerConflictError is raised and the
+    # caller decides whether to reload.
+    action = 'update' if partner_id else 'insert'
+    manager = get_manager(db_file)
+
+    def write(conn):
+        cursor = conn.cursor()
+        if partner_id:
+            sql = '''
+                UPDATE partners SET name = ?, partner_type = ?, rating = ?, address = ?,
+                director_name = ?, phone = ?, email = ?, version = version + 1 WHERE partner_id = ?
+            '''
+            params = tuple(values) + (partner_id,)
+            if expected_version is not None:
+                sql += " AND version = ?"
+                params += (expected_version,)
+            cursor.execute(sql, params)
+            if cursor.rowcount == 0:
+                raise PartnerConflictError(f"partner_id={partner_id} was changed or deleted by another user")
+            return partner_id
+        cursor.execute('''
+            INSERT INTO partners (name, partner_type, rating, address, director_name, phone, email)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', tuple(values))
+        return cursor.lastrowid
+
+    partner_id = manager.run_write(write)
+    manager.notify('partners', partner_id, action)
+    return partner_id
+
+def partner_changes(db_file, after_seq):
+    return get_manager(db_file).fetchall(
+        "SELECT seq, partner_id, action FROM partner_changes WHERE seq > ? ORDER BY seq", (after_seq,))
+
+def last_partner_change(db_file):
+    return get_manager(db_file).fetchone("SELECT COALESCE(MAX(seq), 0), MIN(seq) FROM partner_changes")
+
+def prune_partner_changes(manager):
+    manager.run_write(lambda conn: conn.execute(
+        "DELETE FROM partner_changes WHERE changed_at < datetime('now', ?)", (CHANGE_LOG_RETENTION,)))
+
+def database_stats(db_file):
+    # One read transaction on a reader, so the numbers agree with each other.
+    with get_manager(db_file).reader() as conn:
+        conn.execute("BEGIN")
+        stats = {
+            'db_file': os.path.abspath(db_file),
+            'size_bytes': os.path.getsize(db_file) if os.path.exists(db_file) else 0,
+            'schema_version': conn.execute("PRAGMA user_version").fetchone()[0],
+        }
+        for table, count in read_row_counts(conn).items():
+            stats[f'{table}_count'] = count
+        stats['discount_tiers'] = dict(conn.execute(
+            "SELECT discount_pct, COUNT(*) FROM partner_sales_summary GROUP BY discount_pct ORDER BY discount_pct"
+        ).fetchall())
+    return stats
+
+def calculate_catalog_materials(db_file, material_type_id, quantity):
+    from calculate import calculate_materials_batch, product_catalog_arrays
+    catalog = product_catalog_arrays(get_manager(db_file))
+    needs = calculate_materials_batch(catalog['product_type_id'], material_type_id, quantity,
+                                      catalog['param1'], catalog['param2'])
+    return catalog['product_id'], needs
@@ -0,0 +1,238 @@
+import sqlite3
+import os
+import queue
+import random
+import threading
+import time
+from urllib.request import pathname2url
+from contextlib import contextmanager
+from instrumentation import ProfiledConnection, profiling_enabled
+
+BUSY_TIMEOUT_MS = 5000
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+
+READER_POOL_SIZE = 4
+SCHEMA_CHECK_INTERVAL = 5.0
+WRITE_RETRIES = 10
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+BUSY_ERROR_CODES = (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def is_busy_error(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in BUSY_ERROR_CODES
+    return 'database is locked' in str(error) or 'database is busy' in str(error)
+
+
+def tune_connection(conn):
+    cursor = conn.cursor()
+    for pragma in CONNECTION_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+    return conn
+
+
+class SchemaCache:
+    def __init__(self, manager, check_interval=SCHEMA_CHECK_INTERVAL):
+        self.manager = manager
+        self.check_interval = check_interval
+        self._tables = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        with self.manager.lock:
+            self._tables = None
+
+    def tables(self):
+        # Check and reload under the manager's lock, so two threads never
+        # interleave the staleness check with a reset or a half-done load.
+        with self.manager.lock:
+            now = time.monotonic()
+            if self._tables is not None and now - self._checked_at >= self.check_interval:
+                # Another process may have altered the schema; schema_version
+                # is a header read, far cheaper than rescanning sqlite_master.
+                self._checked_at = now
+                if self.manager.fetchone("PRAGMA schema_version")[0] != self._version:
+                    self._tables = None
+            if self._tables is None:
+                self._load()
+            return self._tables
+
+    def _load(self):
+        self._version = self.manager.fetchone("PRAGMA schema_version")[0]
+        names = [row[0] for row in self.manager.fetchall(
+            "SELECT name FROM sqlite_master WHERE type='table'")]
+        self._tables = {
+            name: [row[1] for row in self.manager.fetchall(f'PRAGMA table_info("{name}")')]
+            for name in names
+        }
+        self._checked_at = time.monotonic()
+
+    def has_table(self, table_name):
+        return table_name in self.tables()
+
+    def columns(self, table_name):
+        return self.tables().get(table_name, [])
+
+
+class ConnectionManager:
+    def __init__(self, db_file, pool_size=READER_POOL_SIZE):
+        self.db_file = db_file
+        self.pool_size = pool_size
+        self.lock = threading.RLock()
+        self._conn = None
+        self._readers = queue.LifoQueue(maxsize=pool_size)
+        self._readers_created = 0
+        self._listeners = []
+        self.schema = SchemaCache(self)
+
+    def _open(self, read_only=False):
+        factory = ProfiledConnection if profiling_enabled() else sqlite3.Connection
+        if read_only:
+            # mode=ro: SQLite refuses every write, including journal mode
+            # changes, and never creates the file.
+            uri = f"file:{pathname2url(os.path.abspath(self.db_file))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=factory)
+        else:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False, factory=factory)
+        return tune_connection(conn)
+
+    def connection(self):
+        with self.lock:
+            if self._conn is None:
+                self._conn = self._open()
+                self._conn.execute("PRAGMA journal_mode = WAL")
+            return self._conn
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            conn = self.connection()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def run_write(self, fn, retries=WRITE_RETRIES):
+        # BEGIN IMMEDIATE takes the write lock up front, so a busy database
+        # fails here instead of midway through fn. It is tried without a busy
+        # timeout: waiting for another process happens in the sleeps between
+        # retries, with self.lock released, so readers and the change poll
+        # are not stuck behind a writer that is itself waiting. Each retry
+        # waits about twice as long as the last (up to RETRY_MAX_DELAY), with
+        # jitter so that competing processes do not retry in step.
+        delay = RETRY_BASE_DELAY
+        for attempt in range(retries + 1):
+            try:
+                with self.transaction() as conn:
+                    self._begin_immediate(conn)
+                    return fn(conn)
+            except sqlite3.OperationalError as e:
+                if attempt == retries or not is_busy_error(e):
+                    raise
+                print(f"Database busy, retrying write in {delay * 1000:.0f} ms")
+            time.sleep(delay * (1 + random.random()))
+            delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    def _begin_immediate(self, conn):
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+
+    def data_version(self):
+        # Changes whenever another connection commits; own commits don't count.
+        return self.fetchone("PRAGMA data_version")[0]
+
+    def fetchone(self, sql, params=()):
+        with self.lock:
+            return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with self.lock:
+            return self.connection().execute(sql, params).fetchall()
+
+    @contextmanager
+    def reader(self):
+        # Background readers get their own read-only connections so they
+        # never wait on the writer's lock; in WAL mode (set by the writer
+        # connection) they read while it writes. Opening one does not open
+        # the writer, so read-only commands leave the file untouched.
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+
+    def _acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self._readers_created < self.pool_size:
+                self._readers_created += 1
+                return self._open(read_only=True)
+        return self._readers.get()
+
+    def _release_reader(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._readers.put(conn)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def notify(self, table, row_id, action):
+        for callback in list(self._listeners):
+            callback(table, row_id, action)
+
+    def close(self):
+        with self.lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._readers_created = 0
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(db_file):
+    key = os.path.abspath(db_file)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = ConnectionManager(db_file)
+            _managers[key] = manager
+        return manager
+
+
+def close_all():
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
+        _managers.clear()
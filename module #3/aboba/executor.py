@@ -0,0 +1,124 @@
+import itertools
+import queue
+import threading
+
+WORKER_COUNT = 2
+POLL_INTERVAL_MS = 50
+
+
+class Task:
+    _ids = itertools.count(1)
+
+    def __init__(self, fn, args, kwargs, on_success=None, on_error=None, quiet=False):
+        self.id = next(self._ids)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_success = on_success
+        self.on_error = on_error
+        self.quiet = quiet
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def cancel(self):
+        # Queued tasks are skipped; a running task finishes but its result is dropped.
+        self.cancelled = True
+
+
+class QueryExecutor:
+    def __init__(self, root, workers=WORKER_COUNT, poll_interval=POLL_INTERVAL_MS, on_busy=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_busy = on_busy
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._calls = queue.Queue()
+        self._pending = 0
+        self._busy = False
+        self._running = True
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f"db-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, fn, *args, on_success=None, on_error=None, quiet=False, **kwargs):
+        # quiet tasks (background refreshes) don't turn on the busy cursor.
+        task = Task(fn, args, kwargs, on_success, on_error, quiet)
+        if not quiet:
+            self._pending += 1
+            if not self._busy:
+                self._set_busy(True)
+        self._jobs.put(task)
+        return task
+
+    def call_soon(self, fn, *args):
+        # Safe from any thread: fn runs on the Tk thread at the next poll.
+        self._calls.put((fn, args))
+
+    def _work(self):
+        while True:
+            task = self._jobs.get()
+            if task is None:
+                break
+            if task.cancelled:
+                self._results.put((task, None, None))
+                continue
+            try:
+                result = task.fn(*task.args, **task.kwargs)
+                self._results.put((task, result, None))
+            except Exception as e:
+                self._results.put((task, None, e))
+
+    def _poll(self):
+        while True:
+            try:
+                fn, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error in scheduled call {getattr(fn, '__name__', fn)}: {str(e)}")
+        while True:
+            try:
+                task, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not task.quiet:
+                self._pending -= 1
+            task.done.set()
+            if task.cancelled:
+                continue
+            try:
+                if error is not None:
+                    if task.on_error is not None:
+                        task.on_error(error)
+                    else:
+                        print(f"Background task {task.id} failed: {str(error)}")
+                elif task.on_success is not None:
+                    task.on_success(result)
+            except Exception as e:
+                print(f"Error delivering result of task {task.id}: {str(e)}")
+        if self._pending == 0 and self._busy:
+            self._set_busy(False)
+        if self._running:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _set_busy(self, busy):
+        self._busy = busy
+        if self.on_busy is not None:
+            self.on_busy(busy)
+
+    def shutdown(self):
+        self._running = False
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        for _ in self._threads:
+            self._jobs.put(None)
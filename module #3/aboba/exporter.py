@@ -0,0 +1,231 @@
+import csv
+import json
+import struct
+import sys
+from array import array
+
+FETCH_SIZE = 5000
+ROW_GROUP_SIZE = 65536
+EXPORT_TABLES = ('partners', 'products', 'sales')
+FORMATS = ('csv', 'columnar')
+
+COLUMNAR_MAGIC = b'PCOL1'
+FOOTER_LENGTH = struct.Struct('<Q')
+INT_TYPECODES = (('b', 1 << 7), ('h', 1 << 15), ('i', 1 << 31), ('q', 1 << 63))
+
+
+def int_array(values):
+    # Narrowest signed type that holds every value in the chunk.
+    low, high = (min(values), max(values)) if values else (0, 0)
+    for typecode, limit in INT_TYPECODES:
+        if -limit <= low and high < limit:
+            return array(typecode, values)
+
+
+def column_kind(declared_type):
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return 'int'
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB')):
+        return 'real'
+    return 'text'
+
+
+def export_query(table, date_from=None, date_to=None, partner_type=None):
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table {table}")
+    clauses = []
+    params = []
+    if table == 'sales':
+        if date_from:
+            clauses.append("t.sale_date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("t.sale_date <= ?")
+            params.append(date_to)
+        if partner_type:
+            clauses.append("t.partner_id IN (SELECT partner_id FROM partners WHERE partner_type = ?)")
+            params.append(partner_type)
+    elif table == 'partners' and partner_type:
+        clauses.append("t.partner_type = ?")
+        params.append(partner_type)
+    elif date_from or date_to or partner_type:
+        raise ValueError(f"Filters are not supported for {table}")
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return f"SELECT t.* FROM {table} t{where} ORDER BY t.rowid", params
+
+
+class CsvExportWriter:
+    def __init__(self, out, columns):
+        self.writer = csv.writer(out)
+        self.writer.writerow([name for name, _ in columns])
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class ColumnarWriter:
+    """Column-oriented binary file, written one row group at a time.
+
+    Layout: magic, row groups, JSON footer, footer length, magic. In a row
+    group every column is stored contiguously and little-endian: integers
+    in the narrowest type that fits the chunk, reals as float64, text as end
+    offsets plus one UTF-8 blob. Text with many repeats (dates, partner
+    types) is dictionary-encoded: distinct values once, then integer codes.
+    Columns with NULLs get a one-byte-per-row null mask. The footer records
+    the schema and where each column chunk starts, so a reader can load
+    just the columns it needs.
+    """
+
+    def __init__(self, out, columns, row_group_size=ROW_GROUP_SIZE):
+        self.out = out
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.pending = []
+        self.row_groups = []
+        self.offset = 0
+        self._write(COLUMNAR_MAGIC)
+
+    def _write(self, data):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def _write_array(self, values):
+        if sys.byteorder != 'little':
+            values.byteswap()
+        start = self.offset
+        self._write(values.tobytes())
+        return [start, self.offset - start, values.typecode]
+
+    def _write_strings(self, chunk, prefix, values):
+        encoded = [value.encode('utf-8') for value in values]
+        ends = []
+        end = 0
+        for item in encoded:
+            end += len(item)
+            ends.append(end)
+        chunk[f'{prefix}offsets'] = self._write_array(int_array(ends))
+        start = self.offset
+        self._write(b''.join(encoded))
+        chunk[f'{prefix}data'] = [start, self.offset - start]
+
+    def write_rows(self, rows):
+        self.pending.extend(rows)
+        while len(self.pending) >= self.row_group_size:
+            self.flush_row_group(self.pending[:self.row_group_size])
+            del self.pending[:self.row_group_size]
+
+    def flush_row_group(self, rows):
+        group = {'rows': len(rows), 'columns': []}
+        for index, (name, kind) in enumerate(self.columns):
+            values = [row[index] for row in rows]
+            chunk = {}
+            if any(value is None for value in values):
+                chunk['nulls'] = self._write_array(array('B', (value is None for value in values)))
+            if kind == 'text':
+                values = ['' if value is None else str(value) for value in values]
+                codes = {}
+                for value in values:
+                    codes.setdefault(value, len(codes))
+                if len(codes) * 2 <= len(values):
+                    self._write_strings(chunk, 'dict_', list(codes))
+                    chunk['codes'] = self._write_array(int_array([codes[value] for value in values]))
+                else:
+                    self._write_strings(chunk, '', values)
+            elif kind == 'int':
+                chunk['data'] = self._write_array(int_array([0 if value is None else value for value in values]))
+            else:
+                chunk['data'] = self._write_array(array('d', (0.0 if value is None else value for value in values)))
+            group['columns'].append(chunk)
+        self.row_groups.append(group)
+
+    def close(self):
+        if self.pending:
+            self.flush_row_group(self.pending)
+            self.pending = []
+        footer = json.dumps({
+            'columns': [{'name': name, 'type': kind} for name, kind in self.columns],
+            'row_groups': self.row_groups,
+        }, ensure_ascii=False).encode('utf-8')
+        self._write(footer)
+        self._write(FOOTER_LENGTH.pack(len(footer)))
+        self._write(COLUMNAR_MAGIC)
+
+
+def read_columnar(path, columns=None):
+    """Yield rows (as tuples of the requested columns) from a columnar file."""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a columnar export")
+        f.seek(-(FOOTER_LENGTH.size + len(COLUMNAR_MAGIC)), 2)
+        footer_length, = FOOTER_LENGTH.unpack(f.read(FOOTER_LENGTH.size))
+        f.seek(-(footer_length + FOOTER_LENGTH.size + len(COLUMNAR_MAGIC)), 2)
+        footer = json.loads(f.read(footer_length).decode('utf-8'))
+        schema = footer['columns']
+        names = [column['name'] for column in schema]
+        wanted = [names.index(name) for name in (columns or names)]
+
+        def read_array(location):
+            start, length, typecode = location
+            f.seek(start)
+            values = array(typecode)
+            values.frombytes(f.read(length))
+            if sys.byteorder != 'little':
+                values.byteswap()
+            return values
+
+        def read_strings(chunk, prefix):
+            ends = read_array(chunk[f'{prefix}offsets']).tolist()
+            f.seek(chunk[f'{prefix}data'][0])
+            blob = f.read(chunk[f'{prefix}data'][1])
+            return [blob[start:end].decode('utf-8') for start, end in zip([0] + ends[:-1], ends)]
+
+        for group in footer['row_groups']:
+            decoded = []
+            for index in wanted:
+                kind = schema[index]['type']
+                chunk = group['columns'][index]
+                if 'codes' in chunk:
+                    dictionary = read_strings(chunk, 'dict_')
+                    values = [dictionary[code] for code in read_array(chunk['codes'])]
+                elif kind == 'text':
+                    values = read_strings(chunk, '')
+                else:
+                    values = read_array(chunk['data']).tolist()
+                if 'nulls' in chunk:
+                    nulls = read_array(chunk['nulls'])
+                    values = [None if null else value for value, null in zip(values, nulls)]
+                decoded.append(values)
+            yield from zip(*decoded)
+
+
+def export_table(manager, table, out, fmt='csv', fetch_size=FETCH_SIZE, **filters):
+    """Stream ``table`` to ``out`` (text stream for csv, binary for columnar).
+
+    Runs on a pooled reader connection inside one read transaction, so the
+    export sees a single consistent snapshot while WAL lets the app keep
+    writing. Rows are pulled fetch_size at a time; memory does not depend
+    on the table size.
+    """
+    sql, params = export_query(table, **filters)
+    with manager.reader() as conn:
+        conn.execute("BEGIN")
+        try:
+            declared = {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+            cursor = conn.execute(sql, params)
+            columns = [(column[0], column_kind(declared.get(column[0]))) for column in cursor.description]
+            writer = ColumnarWriter(out, columns) if fmt == 'columnar' else CsvExportWriter(out, columns)
+            exported = 0
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                writer.write_rows(rows)
+                exported += len(rows)
+            writer.close()
+        finally:
+            conn.rollback()
+    return exported
@@ -0,0 +1,560 @@
+import collections
+import csv
+import hashlib
+import io
+import os
+import sqlite3
+import time
+
+BATCH_SIZE = 5000
+REJECT_FILE = 'import_rejects.csv'
+CHUNK_BYTES = 4 << 20
+PARALLEL_MIN_BYTES = 16 << 20
+
+PARTNER_HEADERS = ['name', 'partner_type', 'rating', 'address', 'director_name', 'phone', 'email']
+PRODUCT_HEADERS = ['name', 'product_type_id', 'param1', 'param2']
+SALES_HEADERS = ['partner_id', 'product_id', 'quantity', 'sale_date']
+
+
+class ImportStats:
+    def __init__(self, table):
+        self.table = table
+        self.rows = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.elapsed = 0.0
+
+    @property
+    def duplicates(self):
+        # Valid rows the unique keys turned into no-ops: already imported.
+        return max(self.rows - self.inserted - self.rejected, 0)
+
+    @property
+    def rows_per_second(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.rows / self.elapsed
+
+    def __repr__(self):
+        return (f"ImportStats({self.table}: rows={self.rows}, inserted={self.inserted}, "
+                f"rejected={self.rejected}, {self.rows_per_second:.0f} rows/s)")
+
+
+def convert_partner(values, context):
+    name, partner_type, rating, address, director_name, phone, email = values
+    rating = int(rating)
+    if not name or not partner_type:
+        raise ValueError("name and partner_type are required")
+    if rating < 0:
+        raise ValueError(f"rating must be non-negative, got {rating}")
+    return (name, partner_type, rating, address or None, director_name or None, phone or None, email or None)
+
+
+def convert_product(values, context):
+    name, product_type_id, param1, param2 = values
+    param1 = float(param1)
+    param2 = float(param2)
+    if not name:
+        raise ValueError("name is required")
+    if param1 <= 0 or param2 <= 0:
+        raise ValueError(f"param1 and param2 must be positive, got {param1}, {param2}")
+    return (name, int(product_type_id), param1, param2)
+
+
+def convert_sale(values, context):
+    partner_id, product_id, quantity, sale_date = values
+    partner_id = int(partner_id)
+    product_id = int(product_id)
+    quantity = int(quantity)
+    if partner_id not in context['valid_partner_ids']:
+        raise ValueError(f"invalid partner_id={partner_id}")
+    if product_id not in context['valid_product_ids']:
+        raise ValueError(f"invalid product_id={product_id}")
+    if quantity <= 0:
+        raise ValueError(f"quantity must be positive, got {quantity}")
+    if not sale_date:
+        raise ValueError("sale_date is required")
+    return (partner_id, product_id, quantity, sale_date)
+
+
+TABLE_SPECS = [
+    {
+        'table': 'partners',
+        'file': 'partners.csv',
+        'headers': PARTNER_HEADERS,
+        'convert': convert_partner,
+        'sql': '''
+            INSERT OR IGNORE INTO partners (name, partner_type, rating, address, director_name, phone, email)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''',
+    },
+    {
+        'table': 'products',
+        'file': 'products.csv',
+        'headers': PRODUCT_HEADERS,
+        'convert': convert_product,
+        'sql': '''
+            INSERT OR IGNORE INTO products (name, product_type_id, param1, param2)
+            VALUES (?, ?, ?, ?)
+        ''',
+    },
+    {
+        'table': 'sales',
+        'file': 'sales.csv',
+        'headers': SALES_HEADERS,
+        'convert': convert_sale,
+        # Sales have no natural key. The plain import appends them as they
+        # are; the sync records the file and line each came from, so that a
+        # rewritten file can replace exactly the rows it contributed.
+        'sql': '''
+            INSERT INTO sales (partner_id, product_id, quantity, sale_date)
+            VALUES (?, ?, ?, ?)
+        ''',
+        'sync_sql': '''
+            INSERT INTO sales (partner_id, product_id, quantity, sale_date, source_file, source_line)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''',
+        'source_column': 'source_file',
+    },
+]
+
+
+def header_positions(spec, header_line):
+    # Index of each of the spec's columns in the file's header line.
+    header = next(csv.reader([header_line]), [])
+    missing = [h for h in spec['headers'] if h not in header]
+    if missing:
+        print(f"Error: {spec['file']} has incorrect headers. Expected: {spec['headers']}, Found: {header}")
+        raise ValueError(f"Incorrect headers in {spec['file']}")
+    return [header.index(h) for h in spec['headers']]
+
+
+class CsvImporter:
+    def __init__(self, manager, csv_dir, batch_size=BATCH_SIZE, reject_path=None,
+                 progress=None, rebuild_indexes=False):
+        self.manager = manager
+        self.csv_dir = csv_dir
+        self.batch_size = batch_size
+        self.reject_path = reject_path or os.path.join(csv_dir, REJECT_FILE)
+        self.progress = progress
+        self.rebuild_indexes = rebuild_indexes
+        self._reject_file = None
+        self._reject_writer = None
+        self.context = {}
+
+    def import_all(self):
+        results = {}
+        try:
+            self.refresh_valid_ids()
+            for spec in TABLE_SPECS:
+                path = os.path.join(self.csv_dir, spec['file'])
+                if not os.path.exists(path):
+                    print(f"Warning: {spec['file']} not found at {path}")
+                    continue
+                results[spec['table']] = self.import_file(spec, path)
+                self.refresh_valid_ids()
+        finally:
+            self.close_rejects()
+        return results
+
+    def refresh_valid_ids(self):
+        self.context['valid_partner_ids'] = {
+            row[0] for row in self.manager.fetchall("SELECT partner_id FROM partners")}
+        self.context['valid_product_ids'] = {
+            row[0] for row in self.manager.fetchall("SELECT product_id FROM products")}
+
+    def import_file(self, spec, path):
+        stats = ImportStats(spec['table'])
+        started = time.perf_counter()
+        dropped_indexes = self.drop_indexes(spec['table']) if self.rebuild_indexes else []
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                positions = header_positions(spec, f.readline())
+                reader = csv.reader(f)
+                convert = spec['convert']
+                batch = []
+                for line_number, row in enumerate(reader, start=2):
+                    stats.rows += 1
+                    try:
+                        batch.append((line_number, convert([row[i] for i in positions], self.context)))
+                    except (ValueError, IndexError) as e:
+                        self.reject(spec['file'], line_number, row, e, stats)
+                    if len(batch) >= self.batch_size:
+                        self.write_batch(spec, batch, stats)
+                        batch = []
+                        stats.elapsed = time.perf_counter() - started
+                        self.report(stats)
+                if batch:
+                    self.write_batch(spec, batch, stats)
+        finally:
+            if dropped_indexes:
+                self.restore_indexes(dropped_indexes)
+        stats.elapsed = time.perf_counter() - started
+        self.report(stats)
+        print(f"Imported {stats.inserted} rows from {spec['file']} "
+              f"({stats.rejected} rejected, {stats.duplicates} already present, "
+              f"{stats.rows_per_second:.0f} rows/s)")
+        return stats
+
+    def write_batch(self, spec, batch, stats, on_commit=None, sql=None):
+        # on_commit runs inside the batch's transaction, so bookkeeping written
+        # there is committed or rolled back together with the rows.
+        sql = sql or spec['sql']
+        try:
+            with self.manager.transaction() as conn:
+                cursor = conn.executemany(sql, [values for _, values in batch])
+                inserted = max(cursor.rowcount, 0)
+                if on_commit is not None:
+                    on_commit(conn)
+            stats.inserted += inserted
+        except sqlite3.IntegrityError:
+            # A row slipped past validation; retry one by one so only it is rejected.
+            with self.manager.transaction() as conn:
+                for line_number, values in batch:
+                    try:
+                        cursor = conn.execute(sql, values)
+                        stats.inserted += max(cursor.rowcount, 0)
+                    except sqlite3.IntegrityError as e:
+                        self.reject(spec['file'], line_number, values, e, stats)
+                if on_commit is not None:
+                    on_commit(conn)
+
+    def reject(self, file_name, line_number, row, error, stats):
+        stats.rejected += 1
+        if self._reject_writer is None:
+            self._reject_file = open(self.reject_path, 'w', encoding='utf-8', newline='')
+            self._reject_writer = csv.writer(self._reject_file)
+            self._reject_writer.writerow(['file', 'line', 'error', 'row'])
+        self._reject_writer.writerow([file_name, line_number, str(error), '|'.join(str(v) for v in row)])
+
+    def close_rejects(self):
+        if self._reject_file is not None:
+            self._reject_file.close()
+            print(f"Rejected rows written to {self.reject_path}")
+            self._reject_file = None
+            self._reject_writer = None
+
+    def report(self, stats):
+        if self.progress is not None:
+            self.progress(stats)
+
+    def drop_indexes(self, table):
+        # Unique indexes stay: they are what turns rows that are already
+        # loaded into no-ops. Dropping and restoring are each one
+        # transaction, so the schema is never left with half the set.
+        unique = {row[1] for row in self.manager.fetchall(f'PRAGMA index_list("{table}")') if row[2]}
+        indexes = [(name, sql) for name, sql in self.manager.fetchall(
+            "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+            (table,)) if name not in unique]
+        with self.manager.transaction() as conn:
+            conn.execute("BEGIN")
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        return indexes
+
+    def restore_indexes(self, indexes):
+        try:
+            with self.manager.transaction() as conn:
+                conn.execute("BEGIN")
+                for _, sql in indexes:
+                    conn.execute(sql)
+        except sqlite3.Error as e:
+            names = ', '.join(name for name, _ in indexes)
+            print(f"Error: could not recreate indexes {names}: {e}")
+            raise
+
+
+def split_ranges(path, start, chunk_bytes=CHUNK_BYTES):
+    # Cuts [start, EOF) into ranges of about chunk_bytes that begin and end on
+    # line boundaries. Assumes no quoted field spans lines, which holds for
+    # the files this app imports.
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        while start < size:
+            end = start + chunk_bytes
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+_worker_context = {}
+
+
+def init_parse_worker(context):
+    _worker_context.update(context)
+
+
+def parse_chunk(path, start, end, table, positions):
+    # Runs in a worker process: returns the converted rows and the rejects,
+    # with line numbers relative to the chunk, plus the chunk's line count.
+    convert = next(spec['convert'] for spec in TABLE_SPECS if spec['table'] == table)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    rows, rejects = [], []
+    line_count = 0
+    for line_count, row in enumerate(csv.reader(io.StringIO(data.decode('utf-8'), newline='')), start=1):
+        try:
+            rows.append((line_count, convert([row[i] for i in positions], _worker_context)))
+        except (ValueError, IndexError) as e:
+            rejects.append((line_count, row, str(e)))
+    return rows, rejects, line_count
+
+
+class ParallelCsvImporter(CsvImporter):
+    """CsvImporter that parses large files in a process pool.
+
+    Files are split into line-aligned byte ranges; workers read, convert and
+    validate their range and send typed rows back. This process stays the
+    only writer and inserts the batches in file order, so SQLite still sees
+    one transaction at a time. Files under min_parallel_bytes are imported
+    serially, where starting the pool would cost more than it saves.
+    """
+
+    def __init__(self, manager, csv_dir, workers=None, chunk_bytes=CHUNK_BYTES,
+                 min_parallel_bytes=PARALLEL_MIN_BYTES, **kwargs):
+        super().__init__(manager, csv_dir, **kwargs)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+        self.min_parallel_bytes = min_parallel_bytes
+
+    def import_file(self, spec, path):
+        if self.workers < 2 or os.path.getsize(path) < self.min_parallel_bytes:
+            return super().import_file(spec, path)
+        from concurrent.futures import ProcessPoolExecutor
+
+        stats = ImportStats(spec['table'])
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            header_line = f.readline()
+        positions = header_positions(spec, header_line.decode('utf-8'))
+        ranges = split_ranges(path, len(header_line), self.chunk_bytes)
+
+        dropped_indexes = self.drop_indexes(spec['table']) if self.rebuild_indexes else []
+        try:
+            with ProcessPoolExecutor(self.workers, initializer=init_parse_worker,
+                                     initargs=(self.context,)) as pool:
+                # Only a few chunks are in flight at once, so parsed rows wait
+                # in memory for the writer no longer than they have to.
+                pending = collections.deque()
+                ranges = iter(ranges)
+                base_line = 1
+                while True:
+                    while len(pending) < self.workers * 2:
+                        chunk = next(ranges, None)
+                        if chunk is None:
+                            break
+                        pending.append(pool.submit(parse_chunk, path, chunk[0], chunk[1],
+                                                   spec['table'], positions))
+                    if not pending:
+                        break
+                    rows, rejects, line_count = pending.popleft().result()
+                    stats.rows += line_count
+                    for line, row, error in rejects:
+                        self.reject(spec['file'], base_line + line, row, error, stats)
+                    for i in range(0, len(rows), self.batch_size):
+                        batch = [(base_line + line, values) for line, values in rows[i:i + self.batch_size]]
+                        self.write_batch(spec, batch, stats)
+                    base_line += line_count
+                    stats.elapsed = time.perf_counter() - started
+                    self.report(stats)
+        finally:
+            if dropped_indexes:
+                self.restore_indexes(dropped_indexes)
+        stats.elapsed = time.perf_counter() - started
+        self.report(stats)
+        print(f"Imported {stats.inserted} rows from {spec['file']} using {self.workers} workers "
+              f"({stats.rejected} rejected, {stats.duplicates} already present, "
+              f"{stats.rows_per_second:.0f} rows/s)")
+        return stats
+
+
+HASH_CHUNK = 1 << 20
+
+
+class SyncState:
+    def __init__(self, row):
+        (self.table, self.path, self.size, self.mtime_ns, self.sha256,
+         self.offset, self.line_number, self.status) = row
+
+
+class RecordReader:
+    """Feeds csv.reader from a binary file while tracking the byte offset.
+
+    csv.reader pulls one line at a time, so after it yields a row
+    ``position`` is exactly the end of that row. A last line without a
+    newline is read like any other. When a sync resumes right after such a
+    line (``continues_line``), the newline that later completes it belongs
+    to the row already read and is consumed without yielding a blank line.
+    """
+
+    def __init__(self, f, hasher, position, continues_line=False):
+        self.f = f
+        self.hasher = hasher
+        self.position = position
+        self.continues_line = continues_line
+
+    def __iter__(self):
+        for raw in self.f:
+            self.hasher.update(raw)
+            self.position += len(raw)
+            if self.continues_line:
+                self.continues_line = False
+                if raw in (b'\n', b'\r\n'):
+                    continue
+            yield raw.decode('utf-8')
+
+
+class CsvSync(CsvImporter):
+    """Imports only what changed in the CSV files since the last sync.
+
+    Progress per file (byte offset, line number and a SHA-256 of the bytes
+    consumed so far) is stored in csv_sync_state in the same transaction as
+    each batch. An interrupted sync resumes after the last committed batch,
+    appended rows are read from the stored offset, and a rewritten file is
+    read again in full. Partners and products already present are no-ops
+    there (they are keyed by name); sales the file contributed before are
+    deleted first, since they have no key of their own.
+    """
+
+    def import_all(self):
+        results = {}
+        try:
+            self.refresh_valid_ids()
+            for spec in TABLE_SPECS:
+                path = os.path.join(self.csv_dir, spec['file'])
+                if not os.path.exists(path):
+                    print(f"Warning: {spec['file']} not found at {path}")
+                    continue
+                results[spec['table']] = self.sync_file(spec, path)
+                self.refresh_valid_ids()
+        finally:
+            self.close_rejects()
+        return results
+
+    def load_state(self, table):
+        row = self.manager.fetchone('''
+            SELECT table_name, path, size, mtime_ns, sha256, byte_offset, line_number, status
+            FROM csv_sync_state WHERE table_name = ?
+        ''', (table,))
+        return SyncState(row) if row else None
+
+    def save_state(self, conn, spec, path, st, hasher, offset, line_number, status):
+        conn.execute('''
+            INSERT OR REPLACE INTO csv_sync_state
+                (table_name, path, size, mtime_ns, sha256, byte_offset, line_number, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+        ''', (spec['table'], path, st.st_size, st.st_mtime_ns, hasher.hexdigest(), offset, line_number, status))
+
+    def hash_prefix(self, f, length):
+        hasher = hashlib.sha256()
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+        return hasher
+
+    def sync_file(self, spec, path):
+        stats = ImportStats(spec['table'])
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        state = self.load_state(spec['table'])
+        if (state is not None and state.status == 'done' and state.path == path
+                and state.size == st.st_size and state.mtime_ns == st.st_mtime_ns):
+            print(f"{spec['file']} unchanged since last sync")
+            return stats
+        if state is None and self.manager.fetchone(f"SELECT 1 FROM {spec['table']} LIMIT 1"):
+            # Data imported before sync tracking existed: take the file as
+            # already loaded, as the old empty-table check did, and only pick
+            # up rows appended from now on.
+            return self.adopt_file(spec, path, st, stats)
+
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            header_line = f.readline()
+            positions = header_positions(spec, header_line.decode('utf-8'))
+
+            resumed = False
+            if state is not None and state.path == path and len(header_line) <= state.offset <= st.st_size:
+                f.seek(0)
+                hasher = self.hash_prefix(f, state.offset)
+                resumed = hasher.hexdigest() == state.sha256
+                if not resumed:
+                    print(f"{spec['file']} was rewritten, reading it again")
+            continues_line = False
+            if resumed:
+                line_number = state.line_number
+                f.seek(state.offset - 1)
+                continues_line = f.read(1) != b'\n'
+                if state.offset < st.st_size:
+                    print(f"Reading {spec['file']} from line {line_number + 1}")
+            else:
+                f.seek(0)
+                hasher = self.hash_prefix(f, len(header_line))
+                line_number = 1
+            records = RecordReader(f, hasher, f.tell(), continues_line)
+            committed = {'offset': records.position, 'line_number': line_number}
+
+            def save_progress(status):
+                def save(conn):
+                    self.save_state(conn, spec, path, st, hasher, committed['offset'],
+                                    committed['line_number'], status)
+                return save
+
+            source = spec.get('source_column')
+            sql = spec.get('sync_sql', spec['sql'])
+            if source and state is not None and not resumed:
+                # The rows this file contributed before are replaced, not
+                # matched: a line number means nothing in a rewritten file.
+                with self.manager.transaction() as conn:
+                    removed = conn.execute(f"DELETE FROM {spec['table']} WHERE {source} = ?", (path,)).rowcount
+                    save_progress('partial')(conn)
+                if removed:
+                    print(f"Removed {removed} rows synced from the previous {spec['file']}")
+
+            convert = spec['convert']
+            batch = []
+            for row in csv.reader(records):
+                line_number += 1
+                stats.rows += 1
+                try:
+                    values = convert([row[i] for i in positions], self.context)
+                    batch.append((line_number, values + (path, line_number) if source else values))
+                except (ValueError, IndexError) as e:
+                    self.reject(spec['file'], line_number, row, e, stats)
+                committed['offset'], committed['line_number'] = records.position, line_number
+                if len(batch) >= self.batch_size:
+                    self.write_batch(spec, batch, stats, on_commit=save_progress('partial'), sql=sql)
+                    batch = []
+                    stats.elapsed = time.perf_counter() - started
+                    self.report(stats)
+            if batch:
+                self.write_batch(spec, batch, stats, on_commit=save_progress('done'), sql=sql)
+            else:
+                with self.manager.transaction() as conn:
+                    save_progress('done')(conn)
+        stats.elapsed = time.perf_counter() - started
+        self.report(stats)
+        print(f"Synced {stats.inserted} new rows from {spec['file']} "
+              f"({stats.rows} read, {stats.rejected} rejected, {stats.duplicates} already present, "
+              f"{stats.rows_per_second:.0f} rows/s)")
+        return stats
+
+    def adopt_file(self, spec, path, st, stats):
+        with open(path, 'rb') as f:
+            records = RecordReader(f, hashlib.sha256(), 0)
+            line_number = sum(1 for _ in records)
+        with self.manager.transaction() as conn:
+            self.save_state(conn, spec, path, st, records.hasher, records.position, line_number, 'done')
+        print(f"{spec['table']} already has data, recorded {spec['file']} as imported")
+        return stats
@@ -0,0 +1,261 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+WINDOW_SIZE = 1000
+SLOW_QUERY_SECONDS = 0.05
+PROFILE_ENV = 'PARTNERS_PROFILE'
+MAX_STATEMENTS = 500
+EXPLAIN_PREFIXES = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+
+class TimingSeries:
+    def __init__(self, window=WINDOW_SIZE):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        # count/total/max cover the whole run, percentiles the last window.
+        return {
+            'count': self.count,
+            'total': round(self.total, 6),
+            'mean': round(self.total / self.count, 6) if self.count else 0.0,
+            'p50': round(self.percentile(0.5), 6),
+            'p95': round(self.percentile(0.95), 6),
+            'max': round(self.max, 6),
+        }
+
+
+class StatsRegistry:
+    def __init__(self, window=WINDOW_SIZE):
+        self.window = window
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.queries = {}
+        self.plans = {}
+        self.statements = {}
+
+    def record(self, name, seconds):
+        with self.lock:
+            series = self.timings.get(name)
+            if series is None:
+                series = self.timings[name] = TimingSeries(self.window)
+            series.add(seconds)
+
+    def record_query(self, sql, seconds):
+        with self.lock:
+            series = self.queries.get(sql)
+            if series is None:
+                series = self.queries[sql] = TimingSeries(self.window)
+            series.add(seconds)
+
+    def record_statement(self, sql):
+        # Traced SQL has its parameters expanded, so distinct texts are capped.
+        with self.lock:
+            if sql not in self.statements and len(self.statements) >= MAX_STATEMENTS:
+                sql = '(other)'
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def has_plan(self, sql):
+        return sql in self.plans
+
+    def record_plan(self, sql, plan):
+        with self.lock:
+            self.plans[sql] = plan
+
+    def full_scans(self):
+        with self.lock:
+            return {sql: plan for sql, plan in self.plans.items() if any(is_full_scan(line) for line in plan)}
+
+    def slow_queries(self, threshold=SLOW_QUERY_SECONDS):
+        with self.lock:
+            items = [(sql, series.summary()) for sql, series in self.queries.items()]
+        return sorted((item for item in items if item[1]['max'] >= threshold),
+                      key=lambda item: item[1]['max'], reverse=True)
+
+    def snapshot(self):
+        full_scans = sorted(self.full_scans())
+        with self.lock:
+            return {
+                'full_scans': full_scans,
+                'timings': {name: series.summary() for name, series in self.timings.items()},
+                'queries': {sql: dict(series.summary(), plan=self.plans.get(sql, []))
+                            for sql, series in self.queries.items()},
+                'statements': dict(self.statements),
+            }
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.queries.clear()
+            self.plans.clear()
+            self.statements.clear()
+
+
+STATS = StatsRegistry()
+_profiling = os.environ.get(PROFILE_ENV, '') not in ('', '0')
+
+
+def profiling_enabled():
+    return _profiling
+
+
+def enable_profiling(enabled=True):
+    # Only connections opened afterwards are profiled.
+    global _profiling
+    _profiling = enabled
+
+
+class timed:
+    """Time a block or a function into STATS under ``name``."""
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self.registry = registry
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        (self.registry or STATS).record(self.name, time.perf_counter() - self.started)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.name, self.registry):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def normalize_sql(sql):
+    return ' '.join(sql.split())
+
+
+def is_full_scan(plan_line):
+    # "SCAN t" reads the whole table; "SCAN t USING INDEX" walks an index and
+    # virtual tables (FTS) plan their own lookups.
+    return plan_line.startswith('SCAN ') and ' USING ' not in plan_line and 'VIRTUAL TABLE' not in plan_line
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    # A SELECT does most of its work while rows are stepped, so fetch time is
+    # added to the statement and recorded once the cursor is drained, reused
+    # or dropped.
+    _sql = None
+    _elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        self._flush()
+        key = normalize_sql(sql)
+        self.connection.explain(key, sql, parameters)
+        return self._run(key, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._flush()
+        return self._run(normalize_sql(sql), super().executemany, sql, seq_of_parameters)
+
+    def _run(self, key, method, *args):
+        self._sql = key
+        started = time.perf_counter()
+        try:
+            result = method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+        if self.description is None:
+            self._flush()
+        return result
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - started
+        if row is None:
+            self._flush()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._elapsed += time.perf_counter() - started
+        if len(rows) < size:
+            self._flush()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - started
+        self._flush()
+        return rows
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        self._flush()
+
+    def _flush(self):
+        if self._sql is not None:
+            self.connection.registry.record_query(self._sql, self._elapsed)
+            self._sql = None
+            self._elapsed = 0.0
+
+
+class ProfiledConnection(sqlite3.Connection):
+    registry = STATS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The trace callback also sees statements that never pass through a
+        # cursor: implicit BEGIN/COMMIT and each trigger program step.
+        self.set_trace_callback(self._on_statement)
+
+    def _on_statement(self, sql):
+        if sql.startswith('EXPLAIN'):
+            return
+        self.registry.record_statement(normalize_sql(sql))
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def explain(self, key, sql, parameters):
+        if self.registry.has_plan(key) or not key.upper().startswith(EXPLAIN_PREFIXES):
+            return
+        try:
+            cursor = sqlite3.Cursor(self)
+            plan = [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+        except sqlite3.Error:
+            plan = []
+        self.registry.record_plan(key, plan)
@@ -1,220 +1,59 @@
+import time
+STARTED = time.perf_counter()
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import sqlite3
-import csv
-import os
-import sys
+from database import get_manager, close_all
+from core import (initialize_database, quick_start, table_exists, load_partner, save_partner_record,
+                  partner_changes, last_partner_change, PartnerConflictError)
+from partner_model import PartnerPageModel
+from executor import QueryExecutor
+from sales_model import SalesHistoryModel
+from instrumentation import STATS, timed, profiling_enabled
 
-def get_script_dir():
-    if getattr(sys, 'frozen', False):
-        return os.path.dirname(sys.executable)
-    return os.path.dirname(os.path.abspath(__file__))
-
-SCRIPT_DIR = get_script_dir()
-
-def create_database(db_file):
-    try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON")
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS partners (
-                partner_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                partner_type TEXT NOT NULL,
-                rating INTEGER NOT NULL CHECK(rating >= 0),
-                address TEXT,
-                director_name TEXT,
-                phone TEXT,
-                email TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                product_type_id INTEGER NOT NULL,
-                param1 REAL NOT NULL CHECK(param1 > 0),
-                param2 REAL NOT NULL CHECK(param2 > 0)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sales (
-                sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                partner_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL CHECK(quantity > 0),
-                sale_date TEXT NOT NULL,
-                FOREIGN KEY (partner_id) REFERENCES partners(partner_id) ON DELETE RESTRICT,
-                FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE RESTRICT
-            )
-        ''')
-
-        conn.commit()
-        print(f"Database tables created successfully in {db_file}")
-    except sqlite3.Error as e:
-        print(f"Error creating database tables: {str(e)}")
-        raise
-    finally:
-        conn.close()
-
-def import_csv_data(db_file):
-    try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA foreign_keys = ON")
-        partner_headers = ['name', 'partner_type', 'rating', 'address', 'director_name', 'phone', 'email']
-        product_headers = ['name', 'product_type_id', 'param1', 'param2']
-        sales_headers = ['partner_id', 'product_id', 'quantity', 'sale_date']
-        partners_inserted = 0
-        products_inserted = 0
-        sales_inserted = 0
-        cursor.execute("SELECT partner_id FROM partners")
-        valid_partner_ids = {row[0] for row in cursor.fetchall()}
-        cursor.execute("SELECT product_id FROM products")
-        valid_product_ids = {row[0] for row in cursor.fetchall()}
-        partners_path = os.path.join(SCRIPT_DIR, 'partners.csv')
-        if os.path.exists(partners_path):
-            with open(partners_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                if not all(h in reader.fieldnames for h in partner_headers):
-                    print(f"Error: partners.csv has incorrect headers. Expected: {partner_headers}, Found: {reader.fieldnames}")
-                    raise ValueError("Incorrect headers in partners.csv")
-                for row in reader:
-                    try:
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO partners (name, partner_type, rating, address, director_name, phone, email)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        ''', (row['name'], row['partner_type'], int(row['rating']), row['address'] or None,
-                              row['director_name'] or None, row['phone'] or None, row['email'] or None))
-                        if cursor.rowcount > 0:
-                            partners_inserted += 1
-                    except (ValueError, sqlite3.Error) as e:
-                        print(f"Error importing row in partners.csv: {row}, Error: {str(e)}")
-                        continue
-            print(f"Imported {partners_inserted} rows from partners.csv")
-        else:
-            print(f"Warning: partners.csv not found at {partners_path}")
-        cursor.execute("SELECT partner_id FROM partners")
-        valid_partner_ids = {row[0] for row in cursor.fetchall()}
-        products_path = os.path.join(SCRIPT_DIR, 'products.csv')
-        if os.path.exists(products_path):
-            with open(products_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                if not all(h in reader.fieldnames for h in product_headers):
-                    print(f"Error: products.csv has incorrect headers. Expected: {product_headers}, Found: {reader.fieldnames}")
-                    raise ValueError("Incorrect headers in products.csv")
-                for row in reader:
-                    try:
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO products (name, product_type_id, param1, param2)
-                            VALUES (?, ?, ?, ?)
-                        ''', (row['name'], int(row['product_type_id']), float(row['param1']), float(row['param2'])))
-                        if cursor.rowcount > 0:
-                            products_inserted += 1
-                    except (ValueError, sqlite3.Error) as e:
-                        print(f"Error importing row in products.csv: {row}, Error: {str(e)}")
-                        continue
-            print(f"Imported {products_inserted} rows from products.csv")
-        else:
-            print(f"Warning: products.csv not found at {products_path}")
-
-        cursor.execute("SELECT product_id FROM products")
-        valid_product_ids = {row[0] for row in cursor.fetchall()}
-        sales_path = os.path.join(SCRIPT_DIR, 'sales.csv')
-        if os.path.exists(sales_path):
-            with open(sales_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                if not all(h in reader.fieldnames for h in sales_headers):
-                    print(f"Error: sales.csv has incorrect headers. Expected: {sales_headers}, Found: {reader.fieldnames}")
-                    raise ValueError("Incorrect headers in sales.csv")
-                for row in reader:
-                    try:
-                        partner_id = int(row['partner_id'])
-                        product_id = int(row['product_id'])
-                        if partner_id not in valid_partner_ids:
-                            print(f"Skipping sale row with invalid partner_id={partner_id}: {row}")
-                            continue
-                        if product_id not in valid_product_ids:
-                            print(f"Skipping sale row with invalid product_id={product_id}: {row}")
-                            continue
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO sales (partner_id, product_id, quantity, sale_date)
-                            VALUES (?, ?, ?, ?)
-                        ''', (partner_id, product_id, int(row['quantity']), row['sale_date']))
-                        if cursor.rowcount > 0:
-                            sales_inserted += 1
-                    except (ValueError, sqlite3.Error) as e:
-                        print(f"Error importing row in sales.csv: {row}, Error: {str(e)}")
-                        continue
-            print(f"Imported {sales_inserted} rows from sales.csv")
-        else:
-            print(f"Warning: sales.csv not found at {sales_path}")
-
-        conn.commit()
-        print("CSV data imported successfully.")
-    except sqlite3.Error as e:
-        print(f"Error importing CSV data: {str(e)}")
-        raise
-    except Exception as e:
-        print(f"General error during CSV import: {str(e)}")
-        raise
-    finally:
-        conn.close()
-
-def initialize_database(db_file):
-    try:
-        create_database(db_file)
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM partners")
-        partners_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM products")
-        products_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM sales")
-        sales_count = cursor.fetchone()[0]
-        conn.close()
-
-        print(f"Database state: partners={partners_count}, products={products_count}, sales={sales_count}")
-        if partners_count == 0 or products_count == 0 or sales_count == 0:
-            print("One or more tables are empty, importing CSV data.")
-            import_csv_data(db_file)
-        else:
-            print("All tables contain data, preserving existing data.")
-    except sqlite3.Error as e:
-        print(f"Database initialization failed: {str(e)}")
-        messagebox.showerror("Ошибка", f"Не удалось инициализировать базу данных: {str(e)}")
-        raise
-    except Exception as e:
-        print(f"Unexpected error during database initialization: {str(e)}")
-        raise
-
-def table_exists(db_file, table_name):
-    try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        exists = cursor.fetchone() is not None
-        conn.close()
-        return exists
-    except sqlite3.Error as e:
-        print(f"Error checking table existence: {str(e)}")
-        return False
+CHANGE_POLL_MS = 1000
+FULL_RELOAD_CHANGES = 500
 
 class PartnerDialog(tk.Toplevel):
-    def __init__(self, parent, db_file, partner_id=None):
+    # Built once and kept hidden between uses; open() only refills the fields.
+    def __init__(self, parent, db_file):
         super().__init__(parent)
+        self.withdraw()
         self.parent = parent
         self.db_file = db_file
-        self.partner_id = partner_id
-        self.title("Редактировать партнера" if partner_id else "Добавить партнера")
+        self.partner_id = None
+        self.version = None
+        self._save_task = None
+        self._load_task = None
         self.geometry("400x300")
         self.transient(parent)
-        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.close)
         self.init_ui()
+
+    def open(self, partner_id=None):
+        for task in (self._save_task, self._load_task):
+            # A save or load from the previous opening must not touch this one.
+            if task is not None:
+                task.cancel()
+        self._save_task = self._load_task = None
+        self.save_button.config(state="normal")
+        self.partner_id = partner_id
+        self.version = None
+        self.title("Редактировать партнера" if partner_id else "Добавить партнера")
+        for entry in (self.name_input, self.rating_input, self.address_input, self.director_input,
+                      self.phone_input, self.email_input):
+            entry.delete(0, "end")
+        self.type_input.set("тип материала")
+        self.deiconify()
+        self.lift()
+        self.grab_set()
         if partner_id:
             self.load_partner_data()
+        self.name_input.focus_set()
+
+    def close(self):
+        self.grab_release()
+        self.withdraw()
 
     def init_ui(self):
         frame = ttk.Frame(self, padding="10")
@@ -251,41 +90,45 @@ class PartnerDialog(tk.Toplevel):
 
         button_frame = ttk.Frame(frame)
         button_frame.grid(row=7, column=0, columnspan=2, pady=10)
-        ttk.Button(button_frame, text="Сохранить", command=self.save_partner).grid(row=0, column=0, padx=5)
-        ttk.Button(button_frame, text="Отмена", command=self.destroy).grid(row=0, column=1, padx=5)
+        self.save_button = ttk.Button(button_frame, text="Сохранить", command=self.save_partner)
+        self.save_button.grid(row=0, column=0, padx=5)
+        ttk.Button(button_frame, text="Отмена", command=self.close).grid(row=0, column=1, padx=5)
 
         frame.columnconfigure(1, weight=1)
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
 
     def load_partner_data(self):
-        try:
-            if not table_exists(self.db_file, 'partners'):
-                messagebox.showerror("Ошибка", "Таблица 'partners' не существует.", parent=self)
-                return
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM partners WHERE partner_id = ?', (self.partner_id,))
-            partner = cursor.fetchone()
-            conn.close()
-
-            if partner:
-                self.name_input.insert(0, partner[1])
-                self.type_input.set(partner[2])
-                self.rating_input.insert(0, str(partner[3]))
-                self.address_input.insert(0, partner[4] or "")
-                self.director_input.insert(0, partner[5] or "")
-                self.phone_input.insert(0, partner[6] or "")
-                self.email_input.insert(0, partner[7] or "")
-        except sqlite3.Error as e:
-            print(f"Error loading partner data: {str(e)}")
-            messagebox.showerror("Ошибка", f"Не удалось загрузить данные партнера: {str(e)}", parent=self)
-
+        # Save stays disabled until the version is known, so an edit is never
+        # saved without the conflict check.
+        self.save_button.config(state="disabled")
+        self._load_task = self.parent.executor.submit(load_partner, self.db_file, self.partner_id,
+                                                      on_success=self.show_partner_data,
+                                                      on_error=self.on_load_failed)
+
+    def show_partner_data(self, partner):
+        self._load_task = None
+        if partner is None:
+            messagebox.showwarning("Ошибка", "Партнер был удален другим пользователем.", parent=self)
+            self.close()
+            return
+        for entry, value in ((self.name_input, partner[1]), (self.rating_input, str(partner[3])),
+                             (self.address_input, partner[4]), (self.director_input, partner[5]),
+                             (self.phone_input, partner[6]), (self.email_input, partner[7])):
+            entry.delete(0, "end")
+            entry.insert(0, value or "")
+        self.type_input.set(partner[2])
+        self.version = partner[8]
+        self.save_button.config(state="normal")
+
+    def on_load_failed(self, error):
+        self._load_task = None
+        print(f"Error loading partner data: {str(error)}")
+        messagebox.showerror("Ошибка", f"Не удалось загрузить данные партнера: {str(error)}", parent=self)
+
+    @timed('PartnerDialog.save_partner')
     def save_partner(self):
         try:
-            if not table_exists(self.db_file, 'partners'):
-                messagebox.showerror("Ошибка", "Таблица 'partners' не существует.", parent=self)
-                return
             name = self.name_input.get().strip()
             partner_type = self.type_input.get()
             rating = int(self.rating_input.get().strip())
@@ -299,87 +142,355 @@ class PartnerDialog(tk.Toplevel):
                                       "Заполните обязательные поля: наименование и рейтинг (неотрицательный).",
                                       parent=self)
                 return
-
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            if self.partner_id:
-                cursor.execute('''
-                    UPDATE partners SET name = ?, partner_type = ?, rating = ?, address = ?,
-                    director_name = ?, phone = ?, email = ? WHERE partner_id = ?
-                ''', (name, partner_type, rating, address, director, phone, email, self.partner_id))
-            else:
-                cursor.execute('''
-                    INSERT INTO partners (name, partner_type, rating, address, director_name, phone, email)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (name, partner_type, rating, address, director, phone, email))
-            conn.commit()
-            conn.close()
-            self.parent.load_partners()
-            self.destroy()
         except ValueError:
             messagebox.showwarning("Ошибка", "Стоимость не может быть пустой и отрицательной", parent=self)
-        except sqlite3.Error as e:
-            print(f"Error saving partner: {str(e)}")
-            messagebox.showerror("Ошибка", f"Ошибка сохранения: {str(e)}", parent=self)
- 
+            return
+        # The write may wait for another process to release the database, so
+        # it runs on a worker; the dialog stays up until it is committed.
+        self.save_button.config(state="disabled")
+        self._save_task = self.parent.executor.submit(
+            save_partner_record, self.db_file, (name, partner_type, rating, address, director, phone, email),
+            self.partner_id, expected_version=self.version, on_success=self.on_saved, on_error=self.on_save_failed)
+
+    def on_saved(self, partner_id):
+        self._save_task = None
+        self.save_button.config(state="normal")
+        self.close()
+
+    def on_save_failed(self, error):
+        self._save_task = None
+        self.save_button.config(state="normal")
+        if isinstance(error, PartnerConflictError):
+            print(f"Conflict saving partner: {str(error)}")
+            if messagebox.askyesno("Конфликт",
+                                   "Партнер был изменен или удален другим пользователем. "
+                                   "Загрузить актуальные данные? Ваши изменения будут потеряны.",
+                                   parent=self):
+                self.open(self.partner_id)
+            return
+        if isinstance(error, sqlite3.IntegrityError) and 'partners.name' in str(error):
+            messagebox.showwarning("Ошибка", "Партнер с таким наименованием уже существует.", parent=self)
+            return
+        print(f"Error saving partner: {str(error)}")
+        messagebox.showerror("Ошибка", f"Ошибка сохранения: {str(error)}", parent=self)
+
+class SalesDialog(tk.Toplevel):
+    def __init__(self, parent, db_file, partner_id):
+        super().__init__(parent)
+        self.parent = parent
+        self.db_file = db_file
+        self.partner_id = partner_id
+        self.model = SalesHistoryModel(get_manager(db_file), partner_id)
+        self._page_pending = False
+        self.title(f"История продаж партнера {partner_id}")
+        self.geometry("700x450")
+        self.transient(parent)
+        self.init_ui()
+        self.parent.executor.submit(self.model.summary, on_success=self.show_summary,
+                                    on_error=self.on_load_failed)
+        self.load_next_page()
+
+    def init_ui(self):
+        frame = ttk.Frame(self, padding="10")
+        frame.grid(row=0, column=0, sticky="nsew")
+
+        self.summary_label = ttk.Label(frame, text="Загрузка...")
+        self.summary_label.grid(row=0, column=0, columnspan=2, sticky="w", pady=(0, 5))
+
+        headers = ["Дата", "Продукция", "Количество", "Нарастающий итог"]
+        self.sales_table = ttk.Treeview(frame, columns=headers, show="headings")
+        for header in headers:
+            self.sales_table.heading(header, text=header)
+            self.sales_table.column(header, width=150)
+        self.sales_table.grid(row=1, column=0, sticky="nsew")
+
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.sales_table.yview)
+        self.sales_table.configure(yscrollcommand=self.on_table_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        ttk.Button(frame, text="Закрыть", command=self.destroy).grid(row=2, column=0, columnspan=2, pady=10)
+
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+    def show_summary(self, summary):
+        if not self.winfo_exists():
+            return
+        count, total, first_date, last_date = summary
+        if not count:
+            self.summary_label.config(text="Продаж нет")
+            return
+        self.summary_label.config(text=f"Продаж: {count}, всего продано: {total}, период: {first_date} — {last_date}")
+
+    def load_next_page(self):
+        if self._page_pending or self.model.exhausted:
+            return
+        self._page_pending = True
+        self.parent.executor.submit(self.model.next_page, on_success=self.show_page,
+                                    on_error=self.on_load_failed)
+
+    def show_page(self, rows):
+        self._page_pending = False
+        if not self.winfo_exists():
+            return
+        for sale_id, sale_date, product_name, quantity, running_total in rows:
+            self.sales_table.insert("", "end", iid=str(sale_id),
+                                    values=(sale_date, product_name, quantity, running_total))
+
+    def on_table_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) > 0.9:
+            self.load_next_page()
+
+    def on_load_failed(self, error):
+        self._page_pending = False
+        print(f"Error loading sales for partner_id={self.partner_id}: {str(error)}")
+        if self.winfo_exists():
+            messagebox.showerror("Ошибка", f"Не удалось загрузить историю продаж: {str(error)}", parent=self)
+
+class StatsDialog(tk.Toplevel):
+    headers = ["Имя", "Вызовов", "Среднее, мс", "p95, мс", "Макс., мс"]
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Статистика производительности")
+        self.geometry("900x500")
+        self.transient(parent)
+        self.init_ui()
+        self.refresh()
+
+    def init_ui(self):
+        frame = ttk.Frame(self, padding="10")
+        frame.grid(row=0, column=0, sticky="nsew")
+
+        self.stats_table = ttk.Treeview(frame, columns=self.headers, show="tree headings")
+        self.stats_table.column("#0", width=0, stretch=False)
+        for header in self.headers:
+            self.stats_table.heading(header, text=header)
+            self.stats_table.column(header, width=100)
+        self.stats_table.column(self.headers[0], width=450)
+        self.stats_table.grid(row=0, column=0, sticky="nsew")
+
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.stats_table.yview)
+        self.stats_table.configure(yscrollcommand=scrollbar.set)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(row=1, column=0, columnspan=2, pady=10)
+        ttk.Button(button_frame, text="Обновить", command=self.refresh).grid(row=0, column=0, padx=5)
+        ttk.Button(button_frame, text="Сохранить в файл", command=self.dump).grid(row=0, column=1, padx=5)
+        ttk.Button(button_frame, text="Закрыть", command=self.destroy).grid(row=0, column=2, padx=5)
+
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+    def refresh(self):
+        self.stats_table.delete(*self.stats_table.get_children())
+        snapshot = STATS.snapshot()
+        full_scans = set(snapshot['full_scans'])
+        sections = [("Функции", snapshot['timings']), ("Запросы", snapshot['queries'])]
+        for title, entries in sections:
+            section = self.stats_table.insert("", "end", values=(title,), open=True)
+            ordered = sorted(entries.items(), key=lambda item: item[1]['max'], reverse=True)
+            for name, summary in ordered:
+                label = f"[SCAN] {name}" if name in full_scans else name
+                self.stats_table.insert(section, "end", values=(
+                    label, summary['count'], f"{summary['mean'] * 1000:.1f}",
+                    f"{summary['p95'] * 1000:.1f}", f"{summary['max'] * 1000:.1f}"))
+        if not profiling_enabled():
+            self.stats_table.insert("", "end", values=("Профилирование запросов выключено (PARTNERS_PROFILE=1)",))
+
+    def dump(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                            initialfile="partners_stats.json",
+                                            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            STATS.dump(path)
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить статистику: {str(e)}", parent=self)
+
 class MainWindow(tk.Tk):
+    headers = ["ID", "Наименование", "Тип", "Мин. стоимость", "Адрес", "Основной материал", "Артикул", "Email",
+               "Скидка, %"]
+
     def __init__(self, db_file):
         super().__init__()
         self.db_file = db_file
+        self._page_pending = False
+        self.partner_model = PartnerPageModel(get_manager(db_file))
         self.title("Учет материлов")
         self.geometry("1400x600")
-        try:
-            initialize_database(self.db_file)
-        except sqlite3.Error:
-            self.destroy()
-            return
+        self._load_task = None
+        self._filter_after_id = None
+        self._partner_dialog = None
+        self._first_rows_shown = False
+        self._poll_id = None
+        self._data_version = None
+        self._change_seq = 0
+        self._change_tasks = {}
+        self.executor = QueryExecutor(self, on_busy=self.set_busy)
+        get_manager(db_file).add_listener(self.on_data_notified)
         self.init_ui()
+        self.bind("<Map>", self.on_first_frame)
+        self.status_label.config(text="Открытие базы данных...")
+        self.executor.submit(quick_start, self.db_file, on_success=self.on_quick_start,
+                             on_error=self.on_initialize_failed)
+
+    def on_first_frame(self, event):
+        if event.widget is not self:
+            return
+        self.unbind("<Map>")
+        elapsed = time.perf_counter() - STARTED
+        STATS.record('startup.first_frame', elapsed)
+        print(f"First frame after {elapsed * 1000:.0f} ms")
+
+    def on_quick_start(self, counts):
+        # A file already at the current schema is shown straight away; the
+        # CSV sync and schema checks run afterwards and only reload the grid
+        # if they imported something.
+        if counts is None:
+            self.status_label.config(text="Инициализация базы данных...")
+            self.executor.submit(initialize_database, self.db_file,
+                                 on_success=self.on_initialized,
+                                 on_error=self.on_initialize_failed)
+            return
+        print(f"Fast start: partners={counts.get('partners')}, products={counts.get('products')}, "
+              f"sales={counts.get('sales')}")
+        self.load_partners()
+        self.executor.submit(initialize_database, self.db_file, on_success=self.on_deferred_initialize,
+                             on_error=self.on_initialize_failed)
+
+    def on_initialized(self, results):
+        self.load_partners()
+        self.start_change_poll()
+
+    def on_deferred_initialize(self, results):
+        if any(stats.inserted for stats in (results or {}).values()):
+            self.load_partners()
+        self.start_change_poll()
+
+    def start_change_poll(self):
+        self.executor.submit(self.read_change_position, on_success=self.on_change_poll_started,
+                             on_error=self.on_change_poll_disabled, quiet=True)
+
+    def read_change_position(self):
+        return get_manager(self.db_file).data_version(), last_partner_change(self.db_file)[0]
+
+    def on_change_poll_started(self, position):
+        self._data_version, self._change_seq = position
+        self.schedule_change_poll()
+
+    def on_change_poll_disabled(self, error):
+        print(f"Change polling disabled: {str(error)}")
+
+    def schedule_change_poll(self):
+        self._poll_id = self.after(CHANGE_POLL_MS, self.poll_changes)
+
+    def poll_changes(self):
+        # The reads run on a worker; the next poll is scheduled once they are
+        # back, so a slow database never piles up polls.
+        self._poll_id = None
+        self.executor.submit(self.read_changes, self.partner_model, self._data_version, self._change_seq,
+                             on_success=self.on_changes_read, on_error=self.on_poll_failed, quiet=True)
+
+    def read_changes(self, model, data_version, change_seq):
+        # PRAGMA data_version is a header read that only moves when another
+        # connection (another operator's window) commits; only then is the
+        # change log read, and only the rows it names are fetched. Returns
+        # None instead of the changes when the window has to be reloaded.
+        version = get_manager(self.db_file).data_version()
+        if version == data_version:
+            return version, change_seq, []
+        changes = partner_changes(self.db_file, change_seq)
+        if not changes:
+            return version, change_seq, []
+        if changes[0][0] != change_seq + 1 or len(changes) > FULL_RELOAD_CHANGES:
+            return version, changes[-1][0], None
+        actions = {}
+        for _, partner_id, action in changes:
+            if action == 'delete' or partner_id not in actions:
+                actions[partner_id] = action
+        return version, changes[-1][0], [
+            (model, partner_id, action, model.fetch_change(partner_id, action))
+            for partner_id, action in actions.items()]
+
+    def on_changes_read(self, result):
+        self._data_version, self._change_seq, changes = result
+        self.schedule_change_poll()
+        if changes is None:
+            self.load_partners()
+            return
+        for change in changes:
+            self.show_change(*change)
+
+    def on_poll_failed(self, error):
+        print(f"Error polling partner changes: {str(error)}")
+        self.schedule_change_poll()
+
+    def on_initialize_failed(self, error):
+        messagebox.showerror("Ошибка", f"Не удалось инициализировать базу данных: {str(error)}", parent=self)
+        self.destroy()
+
+    def set_busy(self, busy):
+        self.config(cursor="watch" if busy else "")
 
     def init_ui(self):
         frame = ttk.Frame(self, padding="10")
         frame.grid(row=0, column=0, sticky="nsew")
 
-        self.partners_table = ttk.Treeview(frame, columns=("ID", "Наименование", "Тип", "Мин. стоимость", "Адрес",
-                                                          "Основной материал", "Артикул", "Email"), show="headings")
-        headers = ["ID", "Наименование", "Тип", "Мин. стоимость", "Адрес", "Основной материал", "Артикул", "Email"]
-        for header in headers:
-            self.partners_table.heading(header, text=header)
+        filter_frame = ttk.Frame(frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        ttk.Label(filter_frame, text="Поиск:").grid(row=0, column=0, padx=(0, 5))
+        self.search_input = ttk.Entry(filter_frame, width=40)
+        self.search_input.grid(row=0, column=1, padx=(0, 10))
+        self.search_input.bind("<KeyRelease>", self.on_filter_changed)
+        ttk.Label(filter_frame, text="Тип:").grid(row=0, column=2, padx=(0, 5))
+        self.type_filter = ttk.Combobox(filter_frame, values=[""], state="readonly", width=20)
+        self.type_filter.grid(row=0, column=3)
+        self.type_filter.bind("<<ComboboxSelected>>", self.on_filter_changed)
+
+        self.partners_table = ttk.Treeview(frame, columns=self.headers, show="headings")
+        for index, header in enumerate(self.headers):
+            self.partners_table.heading(header, text=header, command=lambda i=index: self.sort_by(i))
             self.partners_table.column(header, width=100)
-        self.partners_table.grid(row=0, column=0, sticky="nsew")
+        self.partners_table.grid(row=1, column=0, sticky="nsew")
         self.partners_table.bind("<Double-1>", self.edit_partner)
 
-        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.partners_table.yview)
-        self.partners_table.configure(yscrollcommand=scrollbar.set)
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.partners_table.yview)
+        self.partners_table.configure(yscrollcommand=self.on_table_scroll)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.status_label = ttk.Label(frame, text="")
+        self.status_label.grid(row=2, column=0, columnspan=2, sticky="w")
 
         button_frame = ttk.Frame(frame)
-        button_frame.grid(row=1, column=0, columnspan=2, pady=10)
+        button_frame.grid(row=3, column=0, columnspan=2, pady=10)
         ttk.Button(button_frame, text="Добавить материалы", command=self.add_partner).grid(row=0, column=0, padx=5)
+        ttk.Button(button_frame, text="История продаж", command=self.view_sales).grid(row=0, column=1, padx=5)
 
         frame.columnconfigure(0, weight=1)
-        frame.rowconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
+        self.bind("<F12>", self.show_stats)
 
-        self.load_partners()
-
+    @timed('MainWindow.load_partners')
     def load_partners(self):
         try:
             if not table_exists(self.db_file, 'partners'):
                 messagebox.showerror("Ошибка", "Таблица 'partners' не существует.", parent=self)
                 return
-            for item in self.partners_table.get_children():
-                self.partners_table.delete(item)
-
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM partners')
-            partners = cursor.fetchall()
-            conn.close()
-
-            print(f"Loaded {len(partners)} partners")
-            for partner in partners:
-                self.partners_table.insert("", "end", values=partner)
+            if self._load_task is not None:
+                self._load_task.cancel()
+            self._load_task = self.executor.submit(self.fetch_partner_window,
+                                                   on_success=self.show_partner_window,
+                                                   on_error=self.on_load_failed)
         except sqlite3.Error as e:
             print(f"Error loading partners: {str(e)}")
             messagebox.showerror("Ошибка", f"Не удалось загрузить список партнеров: {str(e)}", parent=self)
@@ -387,15 +498,191 @@ class MainWindow(tk.Tk):
             print(f"Unexpected error in load_partners: {str(e)}")
             messagebox.showerror("Ошибка", f"Неожиданная ошибка: {str(e)}", parent=self)
 
+    @timed('MainWindow.fetch_partner_window')
+    def fetch_partner_window(self):
+        model = self.partner_model.clone()
+        model.initial_window()
+        model.total_count()
+        return model, model.partner_types()
+
+    @timed('MainWindow.show_partner_window')
+    def show_partner_window(self, result):
+        model, partner_types = result
+        self._load_task = None
+        self.partner_model = model
+        self.type_filter.config(values=[""] + partner_types)
+        self.partners_table.delete(*self.partners_table.get_children())
+        print(f"Loaded {len(model.rows)} of {model.total_count()} partners")
+        self.insert_partner_rows(model.rows)
+        if not self._first_rows_shown:
+            self._first_rows_shown = True
+            STATS.record('startup.first_rows', time.perf_counter() - STARTED)
+
+    def on_load_failed(self, error):
+        self._load_task = None
+        print(f"Error loading partners: {str(error)}")
+        messagebox.showerror("Ошибка", f"Не удалось загрузить список партнеров: {str(error)}", parent=self)
+
+    def on_filter_changed(self, event=None):
+        # Debounced so typing a word issues one query, not one per keystroke.
+        if self._filter_after_id is not None:
+            self.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.after(300, self.apply_filter)
+
+    def apply_filter(self):
+        self._filter_after_id = None
+        self.partner_model.set_filter(self.search_input.get(), self.type_filter.get())
+        self.load_partners()
+
+    def sort_by(self, column):
+        descending = self.partner_model.sort_column == column and not self.partner_model.descending
+        self.partner_model.set_sort(column, descending)
+        for index, header in enumerate(self.headers):
+            arrow = (" ▼" if descending else " ▲") if index == column else ""
+            self.partners_table.heading(header, text=header + arrow)
+        self.load_partners()
+
+    def on_data_notified(self, table, row_id, action):
+        # Writes notify from whichever thread made them, often a worker.
+        self.executor.call_soon(self.on_data_changed, table, row_id, action)
+
+    def on_data_changed(self, table, row_id, action):
+        if table != 'partners':
+            return
+        model = self.partner_model
+
+        def on_success(row):
+            # Only the newest fetch for a partner is shown; an older one can
+            # finish later on the other worker.
+            if self._change_tasks.get(row_id) is task:
+                del self._change_tasks[row_id]
+                self.show_change(model, row_id, action, row)
+
+        task = self.executor.submit(model.fetch_change, row_id, action, on_success=on_success,
+                                    on_error=lambda e: print(f"Error refreshing partner {row_id}: {str(e)}"),
+                                    quiet=True)
+        self._change_tasks[row_id] = task
+
+    def show_change(self, model, row_id, action, row):
+        if model is not self.partner_model:
+            # The window was reloaded meanwhile; fetch again for the new one.
+            self.on_data_changed('partners', row_id, action)
+            return
+        row = model.apply_change(row_id, action, row)
+        position = model.positions.get(row_id)
+        if position is None:
+            if self.partners_table.exists(str(row_id)):
+                self.partners_table.delete(str(row_id))
+        elif self.partners_table.exists(str(row_id)):
+            self.partners_table.item(str(row_id), values=row)
+            self.partners_table.move(str(row_id), "", position)
+        else:
+            self.partners_table.insert("", position, iid=str(row_id), values=row)
+        self.update_status()
+
+    def destroy(self):
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        get_manager(self.db_file).remove_listener(self.on_data_notified)
+        self.executor.shutdown()
+        super().destroy()
+
+    def insert_partner_rows(self, partners):
+        for partner in partners:
+            self.partners_table.insert("", "end", iid=str(partner[0]), values=partner)
+        self.update_status()
+
+    def update_status(self):
+        self.status_label.config(
+            text=f"Показано {len(self.partner_model.rows)} из {self.partner_model.total_count()}")
+
+    def on_table_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        model = self.partner_model
+        if self._load_task is not None or not model.rows or self._page_pending:
+            return
+        if float(last) > 0.9 and not model.exhausted:
+            self.load_next_page()
+        elif float(first) < 0.1 and model.first_key is not None:
+            self.load_previous_page()
+
+    # Pages are read on a worker and added to the model here, on the Tk
+    # thread, unless the window was reloaded or moved on meanwhile. The
+    # model then evicts rows at the far end, so the grid holds a few pages
+    # around the visible ones, not everything scrolled past.
+    def load_next_page(self):
+        model = self.partner_model
+        key, limit = model.last_key, model.page_size
+        self._page_pending = True
+        self.executor.submit(model.fetch_page, key, limit,
+                             on_success=lambda page: self.show_next_page(model, key, limit, page),
+                             on_error=self.on_page_failed)
+
+    def load_previous_page(self):
+        model = self.partner_model
+        key, limit = model.first_key, model.page_size
+        self._page_pending = True
+        self.executor.submit(model.fetch_page, key, limit, backward=True,
+                             on_success=lambda page: self.show_previous_page(model, key, limit, page),
+                             on_error=self.on_page_failed)
+
+    def show_next_page(self, model, key, limit, page):
+        self._page_pending = False
+        if model is not self.partner_model or model.last_key != key:
+            return
+        self.insert_partner_rows(model.add_page(page, limit))
+        evicted = model.trim_front()
+        if evicted:
+            top = self.top_row()
+            self.partners_table.delete(*[str(partner_id) for partner_id in evicted])
+            self.scroll_to(top - len(evicted))
+            self.update_status()
+
+    def show_previous_page(self, model, key, limit, page):
+        self._page_pending = False
+        if model is not self.partner_model or model.first_key != key:
+            return
+        top = self.top_row()
+        added = model.add_previous_page(page, limit)
+        for index, partner in enumerate(added):
+            self.partners_table.insert("", index, iid=str(partner[0]), values=partner)
+        evicted = model.trim_back()
+        if evicted:
+            self.partners_table.delete(*[str(partner_id) for partner_id in evicted])
+        self.scroll_to(top + len(added))
+        self.update_status()
+
+    def top_row(self):
+        return round(float(self.partners_table.yview()[0]) * len(self.partners_table.get_children()))
+
+    def scroll_to(self, index):
+        # Keeps the same rows in view after rows above them came or went.
+        count = len(self.partners_table.get_children())
+        if count:
+            self.partners_table.yview_moveto(max(index, 0) / count)
+
+    def on_page_failed(self, error):
+        self._page_pending = False
+        print(f"Error loading partners page: {str(error)}")
+
+    def show_stats(self, event=None):
+        StatsDialog(self)
+
+    def partner_dialog(self):
+        if self._partner_dialog is None:
+            self._partner_dialog = PartnerDialog(self, self.db_file)
+        return self._partner_dialog
+
     def add_partner(self):
-        PartnerDialog(self, self.db_file)
+        self.partner_dialog().open()
 
     def edit_partner(self, event):
         selected_item = self.partners_table.selection()
         if not selected_item:
             return
         partner_id = int(self.partners_table.item(selected_item)["values"][0])
-        PartnerDialog(self, self.db_file, partner_id=partner_id)
+        self.partner_dialog().open(partner_id)
 
     def view_sales(self):
         selected_item = self.partners_table.selection()
@@ -409,4 +696,7 @@ class MainWindow(tk.Tk):
     
 if __name__ == "__main__":
     app = MainWindow("partners.db")
-    app.mainloop()
\ No newline at end of file
+    try:
+        app.mainloop()
+    finally:
+        close_all()
\ No newline at end of file
@@ -0,0 +1,306 @@
+import sqlite3
+from calculate import DISCOUNT_TIERS
+
+DISCOUNT_SQL = '''
+    (SELECT discount_pct FROM discount_tiers
+     WHERE min_quantity <= partner_sales_summary.total_quantity
+     ORDER BY min_quantity DESC LIMIT 1)
+'''
+
+
+def recompute_summary_sql(partner_ref):
+    return f'''
+        DELETE FROM partner_sales_summary WHERE partner_id = {partner_ref};
+        INSERT INTO partner_sales_summary (partner_id, total_quantity, last_sale_date, discount_pct)
+        SELECT partner_id, SUM(quantity), MAX(sale_date), 0 FROM sales
+        WHERE partner_id = {partner_ref} GROUP BY partner_id;
+        UPDATE partner_sales_summary SET discount_pct = {DISCOUNT_SQL}
+        WHERE partner_id = {partner_ref};
+    '''
+
+
+def seed_discount_tiers(conn):
+    conn.execute("DELETE FROM discount_tiers")
+    conn.executemany("INSERT INTO discount_tiers (min_quantity, discount_pct) VALUES (?, ?)", DISCOUNT_TIERS)
+
+
+def create_partner_search(conn):
+    # FTS5 (with the trigram tokenizer for substring matches) is optional in
+    # SQLite builds; without it partner search falls back to LIKE.
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS partners_fts USING fts5(
+                name, address, director_name,
+                content='partners', content_rowid='partner_id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable, using LIKE search: {str(e)}")
+        return
+    conn.execute("INSERT INTO partners_fts(partners_fts) VALUES ('rebuild')")
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_partners_fts_insert AFTER INSERT ON partners
+        BEGIN
+            INSERT INTO partners_fts (rowid, name, address, director_name)
+            VALUES (NEW.partner_id, NEW.name, NEW.address, NEW.director_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_partners_fts_delete AFTER DELETE ON partners
+        BEGIN
+            INSERT INTO partners_fts (partners_fts, rowid, name, address, director_name)
+            VALUES ('delete', OLD.partner_id, OLD.name, OLD.address, OLD.director_name);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_partners_fts_update
+        AFTER UPDATE OF name, address, director_name ON partners
+        BEGIN
+            INSERT INTO partners_fts (partners_fts, rowid, name, address, director_name)
+            VALUES ('delete', OLD.partner_id, OLD.name, OLD.address, OLD.director_name);
+            INSERT INTO partners_fts (rowid, name, address, director_name)
+            VALUES (NEW.partner_id, NEW.name, NEW.address, NEW.director_name);
+        END
+    ''')
+
+
+NATURAL_KEYS = [
+    ('uq_partners_name', 'partners', ('name',)),
+    ('uq_products_name', 'products', ('name',)),
+]
+
+
+def create_natural_keys(conn):
+    # Existing files may already hold duplicates; those keep their data and
+    # simply go without the key, so re-imports into them are not deduplicated.
+    for index, table, columns in NATURAL_KEYS:
+        column_list = ', '.join(columns)
+        duplicate = conn.execute(
+            f"SELECT 1 FROM {table} GROUP BY {column_list} HAVING COUNT(*) > 1 LIMIT 1").fetchone()
+        if duplicate:
+            print(f"Skipping unique key on {table}({column_list}): table has duplicate rows")
+            continue
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {table}({column_list})")
+
+
+COUNTED_TABLES = ('partners', 'products', 'sales')
+
+
+def create_table_stats(conn):
+    # Row counts kept by triggers, so startup and the grid's total read one
+    # row instead of running COUNT(*) over each table.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_stats (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in COUNTED_TABLES:
+        conn.execute("INSERT OR REPLACE INTO table_stats (table_name, row_count) "
+                     f"SELECT '{table}', COUNT(*) FROM {table}")
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count + 1 WHERE table_name = '{table}';
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count - 1 WHERE table_name = '{table}';
+            END
+        ''')
+
+
+def add_sales_source_line(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(sales)")]
+    if 'source_line' not in columns:
+        conn.execute("ALTER TABLE sales ADD COLUMN source_line INTEGER")
+
+
+def add_sales_source_file(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(sales)")]
+    if 'source_file' not in columns:
+        conn.execute("ALTER TABLE sales ADD COLUMN source_file TEXT")
+
+
+def add_partner_versions(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(partners)")]
+    if 'version' not in columns:
+        conn.execute("ALTER TABLE partners ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+
+# Each entry upgrades the schema to its version. Statements must be safe to
+# re-run (IF NOT EXISTS) so a file that already has them is left as is.
+MIGRATIONS = [
+    (1, "sales lookup indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_sales_partner_date ON sales(partner_id, sale_date, quantity)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_product ON sales(product_id, quantity)",
+    ]),
+    (2, "partner sales summary and discount tiers", [
+        '''
+        CREATE TABLE IF NOT EXISTS discount_tiers (
+            min_quantity INTEGER PRIMARY KEY,
+            discount_pct INTEGER NOT NULL CHECK(discount_pct >= 0)
+        )
+        ''',
+        seed_discount_tiers,
+        '''
+        CREATE TABLE IF NOT EXISTS partner_sales_summary (
+            partner_id INTEGER PRIMARY KEY REFERENCES partners(partner_id) ON DELETE CASCADE,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            last_sale_date TEXT,
+            discount_pct INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        "DELETE FROM partner_sales_summary",
+        '''
+        INSERT INTO partner_sales_summary (partner_id, total_quantity, last_sale_date, discount_pct)
+        SELECT partner_id, SUM(quantity), MAX(sale_date), 0 FROM sales GROUP BY partner_id
+        ''',
+        f"UPDATE partner_sales_summary SET discount_pct = {DISCOUNT_SQL}",
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_summary_insert AFTER INSERT ON sales
+        BEGIN
+            INSERT INTO partner_sales_summary (partner_id, total_quantity, last_sale_date, discount_pct)
+            VALUES (NEW.partner_id, NEW.quantity, NEW.sale_date, 0)
+            ON CONFLICT(partner_id) DO UPDATE SET
+                total_quantity = total_quantity + excluded.total_quantity,
+                last_sale_date = MAX(COALESCE(last_sale_date, ''), excluded.last_sale_date);
+            UPDATE partner_sales_summary SET discount_pct = {DISCOUNT_SQL}
+            WHERE partner_id = NEW.partner_id;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_summary_delete AFTER DELETE ON sales
+        BEGIN
+            {recompute_summary_sql("OLD.partner_id")}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sales_summary_update
+        AFTER UPDATE OF partner_id, quantity, sale_date ON sales
+        BEGIN
+            {recompute_summary_sql("OLD.partner_id")}
+            {recompute_summary_sql("NEW.partner_id")}
+        END
+        ''',
+    ]),
+    (3, "partner search and sort indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_partners_name ON partners(name)",
+        "CREATE INDEX IF NOT EXISTS idx_partners_type ON partners(partner_type)",
+        "CREATE INDEX IF NOT EXISTS idx_partners_rating ON partners(rating)",
+        create_partner_search,
+    ]),
+    (4, "incremental CSV sync state and natural keys", [
+        '''
+        CREATE TABLE IF NOT EXISTS csv_sync_state (
+            table_name TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            line_number INTEGER NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('partial', 'done')),
+            updated_at TEXT NOT NULL
+        )
+        ''',
+        create_natural_keys,
+    ]),
+    (5, "trigger-maintained row counts", [
+        create_table_stats,
+    ]),
+    (6, "partner versions and change log", [
+        add_partner_versions,
+        # Updates that don't bump the version themselves (other tools, manual
+        # edits) still invalidate what an open dialog has loaded.
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_partners_version AFTER UPDATE ON partners
+        WHEN NEW.version = OLD.version
+        BEGIN
+            UPDATE partners SET version = OLD.version + 1 WHERE partner_id = NEW.partner_id;
+        END
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS partner_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            partner_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_partners_log_insert AFTER INSERT ON partners
+        BEGIN
+            INSERT INTO partner_changes (partner_id, action) VALUES (NEW.partner_id, 'insert');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_partners_log_update AFTER UPDATE ON partners
+        WHEN NEW.version <> OLD.version
+        BEGIN
+            INSERT INTO partner_changes (partner_id, action) VALUES (NEW.partner_id, 'update');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_partners_log_delete AFTER DELETE ON partners
+        BEGIN
+            INSERT INTO partner_changes (partner_id, action) VALUES (OLD.partner_id, 'delete');
+        END
+        ''',
+    ]),
+    # (partner_id, product_id, sale_date) is not a key: a partner can buy the
+    # same product twice a day. Sales imported from sales.csv are keyed by
+    # their line instead; rows entered any other way have no source_line.
+    (7, "sales source line key", [
+        "DROP INDEX IF EXISTS uq_sales_natural",
+        add_sales_source_line,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_sales_source_line ON sales(source_line) WHERE source_line IS NOT NULL",
+    ]),
+    # A line number alone names a row only within one version of one file.
+    # Synced sales record the file they came from; a rewritten file has its
+    # rows deleted and read again instead of being matched line by line.
+    # Lines written by the plain import before this carry no file and are
+    # no longer treated as synced.
+    (8, "sales source file key", [
+        "DROP INDEX IF EXISTS uq_sales_source_line",
+        add_sales_source_file,
+        "UPDATE sales SET source_file = (SELECT path FROM csv_sync_state WHERE table_name = 'sales') "
+        "WHERE source_line IS NOT NULL",
+        "UPDATE sales SET source_line = NULL WHERE source_file IS NULL",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_sales_source ON sales(source_file, source_line) "
+        "WHERE source_file IS NOT NULL",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(manager):
+    return manager.fetchone("PRAGMA user_version")[0]
+
+
+def run_migrations(manager):
+    current = schema_version(manager)
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            with manager.transaction() as conn:
+                conn.execute("BEGIN")
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+        except sqlite3.Error as e:
+            print(f"Migration {version} ({name}) failed: {str(e)}")
+            raise
+        manager.schema.invalidate()
+        print(f"Applied migration {version}: {name}")
+        applied.append(version)
+        current = version
+    return applied
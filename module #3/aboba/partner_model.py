@@ -0,0 +1,277 @@
+PAGE_SIZE = 200
+PREFETCH_PAGES = 1
+# Visible page plus prefetch on either side; rows beyond are evicted.
+WINDOW_PAGES = 1 + 2 * PREFETCH_PAGES
+
+PARTNER_COLUMNS = ('p.partner_id', 'p.name', 'p.partner_type', 'p.rating', 'p.address', 'p.director_name',
+                   'p.phone', 'p.email', 'COALESCE(s.discount_pct, 0)')
+
+# Sort expressions line up with PARTNER_COLUMNS. Nullable text columns are
+# coalesced so the (sort value, partner_id) keyset comparison stays total.
+SORT_EXPRESSIONS = ('p.partner_id', 'p.name', 'p.partner_type', 'p.rating', "COALESCE(p.address, '')",
+                    "COALESCE(p.director_name, '')", "COALESCE(p.phone, '')", "COALESCE(p.email, '')",
+                    'COALESCE(s.discount_pct, 0)')
+
+FTS_MIN_LENGTH = 3
+
+
+def sort_value(row, sort_column):
+    value = row[sort_column]
+    return '' if value is None else value
+
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class PartnerPageModel:
+    """A window of partner rows, bounded by keyset keys on both ends.
+
+    Rows with keys from first_key (None: from the first row) up to
+    last_key are loaded. next_page/previous_page extend the window at one
+    end and trim_front/trim_back evict rows from the other once it holds
+    more than window_pages pages, so memory, the grid and every reindex
+    stay proportional to the window rather than the table.
+    """
+
+    def __init__(self, manager, page_size=PAGE_SIZE, prefetch_pages=PREFETCH_PAGES, window_pages=WINDOW_PAGES):
+        self.manager = manager
+        self.page_size = page_size
+        self.prefetch_pages = prefetch_pages
+        self.window_pages = window_pages
+        self.search = ''
+        self.partner_type = ''
+        self.sort_column = 0
+        self.descending = False
+        self.reset()
+
+    def reset(self):
+        self.rows = []
+        self.positions = {}
+        self.first_key = None
+        self.last_key = None
+        self.exhausted = False
+        self._total = None
+
+    def clone(self):
+        model = PartnerPageModel(self.manager, self.page_size, self.prefetch_pages, self.window_pages)
+        model.set_filter(self.search, self.partner_type)
+        model.set_sort(self.sort_column, self.descending)
+        return model
+
+    def set_filter(self, search='', partner_type=''):
+        self.search = search.strip()
+        self.partner_type = partner_type
+        self.reset()
+
+    def set_sort(self, sort_column, descending=False):
+        self.sort_column = sort_column
+        self.descending = descending
+        self.reset()
+
+    def select_sql(self):
+        # The discount comes from the trigger-maintained summary, so showing it
+        # costs one primary-key lookup per row rather than a SUM over sales.
+        return (f"SELECT {', '.join(PARTNER_COLUMNS)} FROM partners p "
+                "LEFT JOIN partner_sales_summary s ON s.partner_id = p.partner_id")
+
+    def filter_clauses(self):
+        clauses = []
+        params = []
+        if self.partner_type:
+            clauses.append("p.partner_type = ?")
+            params.append(self.partner_type)
+        if self.search:
+            if len(self.search) >= FTS_MIN_LENGTH and self.manager.schema.has_table('partners_fts'):
+                clauses.append("p.partner_id IN (SELECT rowid FROM partners_fts WHERE partners_fts MATCH ?)")
+                params.append('"' + self.search.replace('"', '""') + '"')
+            else:
+                pattern = f"%{escape_like(self.search)}%"
+                clauses.append("(p.name LIKE ? ESCAPE '\\' OR p.address LIKE ? ESCAPE '\\' "
+                               "OR p.director_name LIKE ? ESCAPE '\\')")
+                params.extend([pattern, pattern, pattern])
+        return clauses, params
+
+    def fetch_page(self, after_key, limit, backward=False):
+        # backward: the rows just before after_key, still in window order.
+        clauses, params = self.filter_clauses()
+        sort_sql = SORT_EXPRESSIONS[self.sort_column]
+        descending = self.descending != backward
+        direction = 'DESC' if descending else 'ASC'
+        if after_key is not None:
+            clauses.append(f"({sort_sql}, p.partner_id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after_key)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.manager.fetchall(
+            f"{self.select_sql()}{where} ORDER BY {sort_sql} {direction}, p.partner_id {direction} LIMIT ?",
+            params + [limit])
+        return rows[::-1] if backward else rows
+
+    def row_key(self, row):
+        return (sort_value(row, self.sort_column), row[0])
+
+    def total_count(self):
+        # Counted once per reset; inserts made through the app adjust it.
+        if self._total is None:
+            clauses, params = self.filter_clauses()
+            if not clauses and self.manager.schema.has_table('table_stats'):
+                self._total = self.manager.fetchone(
+                    "SELECT row_count FROM table_stats WHERE table_name = 'partners'")[0]
+            else:
+                where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+                self._total = self.manager.fetchone(f"SELECT COUNT(*) FROM partners p{where}", params)[0]
+        return self._total
+
+    def adjust_total(self, delta):
+        if self._total is not None:
+            self._total += delta
+
+    def partner_types(self):
+        return [row[0] for row in self.manager.fetchall(
+            "SELECT DISTINCT partner_type FROM partners ORDER BY partner_type")]
+
+    def initial_window(self):
+        return self.ensure_loaded(self.page_size * (1 + self.prefetch_pages))
+
+    def next_page(self):
+        return self.ensure_loaded(len(self.rows) + self.page_size)
+
+    def ensure_loaded(self, count):
+        loaded = []
+        while len(self.rows) < count and not self.exhausted:
+            limit = count - len(self.rows)
+            loaded.extend(self.add_page(self.fetch_page(self.last_key, limit), limit))
+        return loaded
+
+    def add_page(self, page, limit):
+        # fetch_page may run on a worker; adding its rows is left to the
+        # thread that owns the model.
+        if len(page) < limit:
+            self.exhausted = True
+        loaded = []
+        if page:
+            self.last_key = self.row_key(page[-1])
+            for row in page:
+                # A row moved past last_key by an edit was dropped from the
+                # window, but one kept in place must not be loaded twice.
+                if row[0] in self.positions:
+                    continue
+                self.positions[row[0]] = len(self.rows)
+                self.rows.append(row)
+                loaded.append(row)
+        return loaded
+
+    def previous_page(self):
+        if self.first_key is None:
+            return []
+        return self.add_previous_page(self.fetch_page(self.first_key, self.page_size, backward=True),
+                                      self.page_size)
+
+    def add_previous_page(self, page, limit):
+        if len(page) < limit:
+            self.first_key = None
+        elif page:
+            self.first_key = self.row_key(page[0])
+        loaded = [row for row in page if row[0] not in self.positions]
+        self.rows[:0] = loaded
+        self.reindex()
+        return loaded
+
+    def reindex(self, start=0):
+        for i in range(start, len(self.rows)):
+            self.positions[self.rows[i][0]] = i
+
+    def trim_front(self):
+        # Returns the ids of the evicted rows. The window then starts at the
+        # first row left, so previous_page reads them again.
+        excess = len(self.rows) - self.page_size * self.window_pages
+        if excess <= 0:
+            return []
+        evicted = self.rows[:excess]
+        del self.rows[:excess]
+        for row in evicted:
+            del self.positions[row[0]]
+        self.first_key = self.row_key(self.rows[0])
+        self.reindex()
+        return [row[0] for row in evicted]
+
+    def trim_back(self):
+        excess = len(self.rows) - self.page_size * self.window_pages
+        if excess <= 0:
+            return []
+        evicted = self.rows[-excess:]
+        del self.rows[-excess:]
+        for row in evicted:
+            del self.positions[row[0]]
+        self.last_key = self.row_key(self.rows[-1])
+        self.exhausted = False
+        return [row[0] for row in evicted]
+
+    def fetch_row(self, partner_id, filtered=False):
+        clauses, params = self.filter_clauses() if filtered else ([], [])
+        clauses.append("p.partner_id = ?")
+        return self.manager.fetchone(f"{self.select_sql()} WHERE {' AND '.join(clauses)}", params + [partner_id])
+
+    def precedes(self, key, other):
+        return key > other if self.descending else key < other
+
+    def remove_row(self, partner_id):
+        position = self.positions.pop(partner_id, None)
+        if position is None:
+            return False
+        del self.rows[position]
+        for row in self.rows[position:]:
+            self.positions[row[0]] -= 1
+        return True
+
+    def place_row(self, row):
+        # Puts the row at its sort position if that lies inside the loaded
+        # window; a row sorting before first_key or after last_key is left
+        # for previous_page/next_page.
+        key = self.row_key(row)
+        if self.first_key is not None and self.precedes(key, self.first_key):
+            return None
+        if not self.exhausted and (self.last_key is None or self.precedes(self.last_key, key)):
+            return None
+        if self.last_key is None or self.precedes(self.last_key, key):
+            self.last_key = key
+        position = next((i for i, other in enumerate(self.rows) if self.precedes(key, self.row_key(other))),
+                        len(self.rows))
+        self.rows.insert(position, row)
+        self.reindex(position)
+        return position
+
+    def fetch_change(self, partner_id, action):
+        # The read half of a change, safe to run on a worker: the current row
+        # (unfiltered if it is loaded, else only if it matches the filter).
+        if action == 'delete':
+            return None
+        return self.fetch_row(partner_id, filtered=partner_id not in self.positions)
+
+    def apply_change(self, partner_id, action, row):
+        # Takes the row from fetch_change and returns it if it belongs to the
+        # loaded window, else None; positions tells the caller where it now
+        # sits. A row whose sort key changed is moved, or dropped when it now
+        # sorts outside the window (paging fetches it again there).
+        if action == 'delete':
+            if self.remove_row(partner_id):
+                self.adjust_total(-1)
+            return None
+        position = self.positions.get(partner_id)
+        if position is not None:
+            if row is None:
+                # Deleted since the change was logged.
+                self.remove_row(partner_id)
+                self.adjust_total(-1)
+                return None
+            if self.row_key(row) == self.row_key(self.rows[position]):
+                self.rows[position] = row
+                return row
+            self.remove_row(partner_id)
+            return row if self.place_row(row) is not None else None
+        # An unloaded row can also move into the window when its key changes.
+        if row is None:
+            return None
+        if action == 'insert':
+            self.adjust_total(1)
+        return row if self.place_row(row) is not None else None
@@ -0,0 +1,46 @@
+SALES_PAGE_SIZE = 500
+
+
+class SalesHistoryModel:
+    def __init__(self, manager, partner_id, page_size=SALES_PAGE_SIZE):
+        self.manager = manager
+        self.partner_id = partner_id
+        self.page_size = page_size
+        self.last_key = ('', 0)
+        self.running_total = 0
+        self.loaded = 0
+        self.exhausted = False
+
+    def summary(self):
+        # Served by the covering (partner_id, sale_date, quantity) index.
+        with self.manager.reader() as conn:
+            return conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(quantity), 0), MIN(sale_date), MAX(sale_date) "
+                "FROM sales WHERE partner_id = ?", (self.partner_id,)).fetchone()
+
+    def next_page(self):
+        # The window sum only covers this page, so the total carried over from
+        # earlier pages is added back in SQL.
+        if self.exhausted:
+            return []
+        with self.manager.reader() as conn:
+            rows = conn.execute('''
+                SELECT sale_id, sale_date, product_name, quantity,
+                       ? + SUM(quantity) OVER (ORDER BY sale_date, sale_id) AS running_total
+                FROM (
+                    SELECT s.sale_id, s.sale_date, pr.name AS product_name, s.quantity
+                    FROM sales s JOIN products pr ON pr.product_id = s.product_id
+                    WHERE s.partner_id = ? AND (s.sale_date, s.sale_id) > (?, ?)
+                    ORDER BY s.sale_date, s.sale_id
+                    LIMIT ?
+                )
+                ORDER BY sale_date, sale_id
+            ''', (self.running_total, self.partner_id, self.last_key[0], self.last_key[1],
+                  self.page_size)).fetchall()
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if rows:
+            self.last_key = (rows[-1][1], rows[-1][0])
+            self.running_total = rows[-1][4]
+            self.loaded += len(rows)
+        return rows
@@ -0,0 +1,185 @@
+from array import array
+
+FETCH_SIZE = 10000
+
+
+class DictionaryColumn:
+    """Repeated values stored once, rows hold small integer codes."""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes = array('i')
+
+    def code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.code(value))
+
+    def __setitem__(self, position, value):
+        self.codes[position] = self.code(value)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class ColumnTable:
+    # Numeric columns are typed arrays (8 bytes per int64/double value, no
+    # per-row objects); text columns are dictionary-encoded.
+    def __init__(self, name, sql, columns):
+        self.name = name
+        self.sql = sql
+        self.columns = {}
+        for column, typecode in columns:
+            self.columns[column] = DictionaryColumn() if typecode is None else array(typecode)
+        self.watermark = 0
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.columns['rowid'])
+
+    def append_rows(self, rows):
+        appenders = [column.append for column in self.columns.values()]
+        ids = self.columns['rowid']
+        for row in rows:
+            self.positions[row[0]] = len(ids)
+            for append, value in zip(appenders, row):
+                append(value)
+        if rows:
+            self.watermark = max(self.watermark, rows[-1][0])
+
+    def replace_row(self, row):
+        position = self.positions.get(row[0])
+        if position is None:
+            self.append_rows([row])
+            return
+        for column, value in zip(self.columns.values(), row):
+            column[position] = value
+
+    def load(self, conn, after=0):
+        cursor = conn.execute(f"{self.sql} WHERE rowid > ? ORDER BY rowid", (after,))
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            self.append_rows(rows)
+
+    def numpy(self, column):
+        # Zero-copy view over the array buffer. Don't hold on to it across
+        # refresh(): an array with a live view cannot grow.
+        import numpy as np
+        data = self.columns[column]
+        if isinstance(data, DictionaryColumn):
+            data = data.codes
+        return np.frombuffer(data, dtype=np.dtype(data.typecode))
+
+
+TABLES = {
+    'partners': ("SELECT partner_id, partner_type, rating FROM partners",
+                 [('rowid', 'q'), ('partner_type', None), ('rating', 'q')]),
+    'products': ("SELECT product_id, product_type_id, param1, param2 FROM products",
+                 [('rowid', 'q'), ('product_type_id', None), ('param1', 'd'), ('param2', 'd')]),
+    'sales': ("SELECT sale_id, partner_id, product_id, quantity, substr(sale_date, 1, 7) FROM sales",
+              [('rowid', 'q'), ('partner_id', 'q'), ('product_id', 'q'), ('quantity', 'q'), ('month', None)]),
+}
+
+
+class AnalyticsSnapshot:
+    """Columnar in-memory copy of partners, products and sales.
+
+    load() reads the three tables once inside a single read transaction;
+    refresh() appends rows past each table's rowid watermark and re-reads
+    partners edited through the app since the last refresh. Aggregations
+    run on the arrays (through NumPy) without going back to SQLite. Edits
+    to existing products or sales made outside the app are only picked up
+    by load().
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.tables = {}
+        self._dirty_partners = set()
+        self.manager.add_listener(self.on_data_changed)
+
+    def close(self):
+        self.manager.remove_listener(self.on_data_changed)
+
+    def on_data_changed(self, table, row_id, action):
+        if table == 'partners':
+            self._dirty_partners.add(row_id)
+
+    def load(self):
+        self.tables = {name: ColumnTable(name, sql, columns) for name, (sql, columns) in TABLES.items()}
+        self._dirty_partners.clear()
+        self._read(lambda table: 0)
+        return self
+
+    def refresh(self):
+        if not self.tables:
+            return self.load()
+        dirty, self._dirty_partners = self._dirty_partners, set()
+        self._read(lambda table: table.watermark, dirty)
+        return self
+
+    def _read(self, after, dirty_partners=()):
+        # One read transaction, so sales never point at partners or products
+        # the snapshot has not seen yet.
+        with self.manager.reader() as conn:
+            conn.execute("BEGIN")
+            try:
+                for table in self.tables.values():
+                    table.load(conn, after(table))
+                partners = self.tables['partners']
+                for partner_id in dirty_partners:
+                    row = conn.execute(f"{partners.sql} WHERE partner_id = ?", (partner_id,)).fetchone()
+                    if row is not None:
+                        partners.replace_row(row)
+            finally:
+                conn.rollback()
+
+    def row_counts(self):
+        return {name: len(table) for name, table in self.tables.items()}
+
+    def _sum_by(self, codes, labels):
+        import numpy as np
+        quantities = self.tables['sales'].numpy('quantity')
+        totals = np.bincount(codes, weights=quantities, minlength=len(labels)) if len(codes) else []
+        return {label: int(total) for label, total in zip(labels, totals) if total}
+
+    def _lookup(self, table_name, column):
+        # Dense id -> code array so sales can be joined by indexing.
+        import numpy as np
+        table = self.tables[table_name]
+        ids = table.numpy('rowid')
+        lookup = np.full(int(ids.max()) + 1 if len(ids) else 1, -1, dtype=np.int64)
+        lookup[ids] = table.numpy(column)
+        return lookup
+
+    def sales_by_partner(self):
+        import numpy as np
+        sales = self.tables['sales']
+        partner_ids = sales.numpy('partner_id')
+        if not len(partner_ids):
+            return {}
+        totals = np.bincount(partner_ids, weights=sales.numpy('quantity'))
+        present = np.nonzero(totals)[0]
+        return {int(partner_id): int(totals[partner_id]) for partner_id in present}
+
+    def sales_by_month(self):
+        months = self.tables['sales'].columns['month'].values
+        return dict(sorted(self._sum_by(self.tables['sales'].numpy('month'), months).items()))
+
+    def sales_by_product_type(self):
+        product_types = self.tables['products'].columns['product_type_id'].values
+        codes = self._lookup('products', 'product_type_id')[self.tables['sales'].numpy('product_id')]
+        return dict(sorted(self._sum_by(codes, product_types).items()))
+
+    def sales_by_partner_type(self):
+        partner_types = self.tables['partners'].columns['partner_type'].values
+        codes = self._lookup('partners', 'partner_type')[self.tables['sales'].numpy('partner_id')]
+        return dict(sorted(self._sum_by(codes, partner_types).items()))
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from core import create_database, save_partner_record
+from database import get_manager, close_all
+from migrations import run_migrations
+from partner_model import PartnerPageModel
+
+PARTNERS = 30
+RATING_COLUMN = 3
+
+
+def partner_values(i, rating):
+    return (f"Партнер {i:02d}", "ООО", rating, None, None, None, None)
+
+
+class PartnerPageModelTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='partners-model-')
+        self.db_file = os.path.join(self.work_dir, 'test.db')
+        with redirect_stdout(StringIO()):
+            create_database(self.db_file)
+            run_migrations(get_manager(self.db_file))
+        for i in range(1, PARTNERS + 1):
+            save_partner_record(self.db_file, partner_values(i, i))
+        self.model = PartnerPageModel(get_manager(self.db_file), page_size=5, prefetch_pages=0)
+        self.model.set_sort(RATING_COLUMN)
+        self.model.initial_window()
+
+    def tearDown(self):
+        close_all()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def update_rating(self, partner_id, rating):
+        save_partner_record(self.db_file, partner_values(partner_id, rating), partner_id)
+        return self.model.apply_change(partner_id, 'update', self.model.fetch_change(partner_id, 'update'))
+
+    def assert_window_matches_database(self):
+        while not self.model.exhausted:
+            self.model.next_page()
+        fresh = PartnerPageModel(get_manager(self.db_file), page_size=PARTNERS)
+        fresh.set_sort(RATING_COLUMN)
+        fresh.initial_window()
+        self.assertEqual([row[0] for row in self.model.rows], [row[0] for row in fresh.rows])
+        self.assertEqual({row[0]: i for i, row in enumerate(self.model.rows)}, self.model.positions)
+
+    def test_row_moved_past_the_window_is_not_loaded_twice(self):
+        self.assertIsNone(self.update_rating(2, 100))
+        self.assertNotIn(2, self.model.positions)
+        self.assert_window_matches_database()
+
+    def test_row_moved_inside_the_window_keeps_its_place_in_order(self):
+        row = self.update_rating(4, 0)
+        self.assertEqual(row[0], 4)
+        self.assertEqual(self.model.positions[4], 0)
+        self.assert_window_matches_database()
+
+    def test_unloaded_row_moved_into_the_window_is_shown(self):
+        self.assertIsNotNone(self.update_rating(20, 0))
+        self.assert_window_matches_database()
+
+    def scroll_down(self, pages):
+        model = PartnerPageModel(get_manager(self.db_file), page_size=5, prefetch_pages=0, window_pages=2)
+        model.set_sort(RATING_COLUMN)
+        model.initial_window()
+        for _ in range(pages):
+            model.next_page()
+            model.trim_front()
+        return model
+
+    def test_scrolling_keeps_only_the_window_loaded(self):
+        model = self.scroll_down(4)
+        self.assertEqual([row[0] for row in model.rows], list(range(16, 26)))
+        self.assertEqual({row[0]: i for i, row in enumerate(model.rows)}, model.positions)
+
+    def test_previous_page_reloads_evicted_rows(self):
+        model = self.scroll_down(4)
+        model.previous_page()
+        self.assertEqual(model.trim_back(), list(range(21, 26)))
+        self.assertEqual([row[0] for row in model.rows], list(range(11, 21)))
+        model.previous_page()
+        model.previous_page()
+        model.trim_back()
+        self.assertEqual([row[0] for row in model.rows], list(range(1, 11)))
+        self.assertEqual(model.previous_page(), [])
+        self.assertIsNone(model.first_key)
+
+    def test_row_moved_before_the_window_is_dropped(self):
+        model = self.scroll_down(4)
+        save_partner_record(self.db_file, partner_values(20, 0), 20)
+        self.assertIsNone(model.apply_change(20, 'update', model.fetch_change(20, 'update')))
+        self.assertNotIn(20, model.positions)
+        self.assertEqual({row[0]: i for i, row in enumerate(model.rows)}, model.positions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from core import create_database, import_csv_data, sync_csv_data
+from database import get_manager, close_all
+from importer import PARTNER_HEADERS, PRODUCT_HEADERS, SALES_HEADERS
+from migrations import run_migrations
+
+HEADER = ','.join(PARTNER_HEADERS) + '\n'
+SALES_HEADER = ','.join(SALES_HEADERS) + '\n'
+
+
+def partner_line(i):
+    return f"Партнер {i},ООО,5,г. Москва,Директор {i},+7 900 000 00 0{i},p{i}@example.com"
+
+
+class CsvSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = tempfile.mkdtemp(prefix='partners-sync-')
+        self.db_file = os.path.join(self.csv_dir, 'test.db')
+        self.csv_file = os.path.join(self.csv_dir, 'partners.csv')
+        with redirect_stdout(StringIO()):
+            create_database(self.db_file)
+            run_migrations(get_manager(self.db_file))
+
+    def tearDown(self):
+        close_all()
+        shutil.rmtree(self.csv_dir, ignore_errors=True)
+
+    def write(self, text, mode='w', name='partners.csv', csv_dir=None):
+        with open(os.path.join(csv_dir or self.csv_dir, name), mode, encoding='utf-8', newline='') as f:
+            f.write(text)
+
+    def sync(self, table='partners', csv_dir=None):
+        with redirect_stdout(StringIO()):
+            return sync_csv_data(self.db_file, csv_dir=csv_dir or self.csv_dir)[table]
+
+    def write_sales(self, quantities, csv_dir=None):
+        # Partners and a product for the sales to point at; one sale per quantity.
+        csv_dir = csv_dir or self.csv_dir
+        self.write(HEADER + partner_line(1) + '\n', csv_dir=csv_dir)
+        self.write(','.join(PRODUCT_HEADERS) + '\nПродукция 1,1,2.0,3.0\n', name='products.csv', csv_dir=csv_dir)
+        self.write(SALES_HEADER + ''.join(f"1,1,{quantity},2024-01-01\n" for quantity in quantities),
+                   name='sales.csv', csv_dir=csv_dir)
+
+    def sales(self):
+        manager = get_manager(self.db_file)
+        quantities = sorted(row[0] for row in manager.fetchall("SELECT quantity FROM sales"))
+        summary = manager.fetchone("SELECT total_quantity FROM partner_sales_summary WHERE partner_id = 1")
+        return quantities, summary[0] if summary else 0
+
+    def partner_names(self):
+        rows = get_manager(self.db_file).fetchall("SELECT name FROM partners ORDER BY partner_id")
+        return [row[0] for row in rows]
+
+    def test_last_line_without_newline_is_imported(self):
+        self.write(HEADER + partner_line(1) + '\n' + partner_line(2))
+        stats = self.sync()
+        self.assertEqual(stats.inserted, 2)
+        self.assertEqual(self.partner_names(), ['Партнер 1', 'Партнер 2'])
+
+        self.assertEqual(self.sync().rows, 0)
+        self.assertEqual(self.partner_names(), ['Партнер 1', 'Партнер 2'])
+
+    def test_append_after_last_line_without_newline(self):
+        self.write(HEADER + partner_line(1))
+        self.sync()
+        self.write('\n' + partner_line(2) + '\n', mode='a')
+        stats = self.sync()
+        self.assertEqual((stats.rows, stats.inserted, stats.rejected), (1, 1, 0))
+        self.assertEqual(self.partner_names(), ['Партнер 1', 'Партнер 2'])
+
+    def test_rewritten_file_is_read_again_without_duplicates(self):
+        self.write(HEADER + partner_line(1) + '\n' + partner_line(2))
+        self.sync()
+        self.write(HEADER + partner_line(2) + '\n' + partner_line(1) + '\n' + partner_line(3) + '\n')
+        stats = self.sync()
+        self.assertEqual((stats.inserted, stats.duplicates), (1, 2))
+        self.assertEqual(self.partner_names(), ['Партнер 1', 'Партнер 2', 'Партнер 3'])
+
+    def test_rewritten_sales_file_replaces_its_rows(self):
+        self.write_sales([1, 2])
+        self.sync('sales')
+        self.write_sales([100, 200, 300])
+        stats = self.sync('sales')
+        self.assertEqual(stats.inserted, 3)
+        self.assertEqual(self.sales(), ([100, 200, 300], 600))
+
+    def test_sale_inserted_in_the_middle_of_a_rewritten_file(self):
+        self.write_sales([1, 2])
+        self.sync('sales')
+        self.write_sales([1, 5, 2])
+        self.sync('sales')
+        self.assertEqual(self.sales(), ([1, 2, 5], 8))
+
+    def test_sales_from_two_directories(self):
+        other_dir = tempfile.mkdtemp(prefix='partners-sync-other-')
+        self.addCleanup(shutil.rmtree, other_dir, ignore_errors=True)
+        self.write_sales([1, 2])
+        self.write_sales([7], csv_dir=other_dir)
+        self.sync('sales')
+        self.assertEqual(self.sync('sales', csv_dir=other_dir).inserted, 1)
+        self.sync('sales')
+        self.assertEqual(self.sales(), ([1, 2, 7], 10))
+
+    def test_import_appends_sales_without_line_dedup(self):
+        other_dir = tempfile.mkdtemp(prefix='partners-import-other-')
+        self.addCleanup(shutil.rmtree, other_dir, ignore_errors=True)
+        self.write_sales([1, 2])
+        self.write_sales([7], csv_dir=other_dir)
+        self.sync('sales')
+        with redirect_stdout(StringIO()):
+            stats = import_csv_data(self.db_file, csv_dir=other_dir)['sales']
+        self.assertEqual(stats.inserted, 1)
+        self.assertEqual(self.sales(), ([1, 2, 7], 10))
+
+    def test_rebuild_indexes_keeps_unique_indexes(self):
+        manager = get_manager(self.db_file)
+        index_sql = "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='partners' ORDER BY name"
+        before = manager.fetchall(index_sql)
+        self.write(HEADER + partner_line(1) + '\n' + partner_line(2) + '\n')
+        with redirect_stdout(StringIO()):
+            import_csv_data(self.db_file, csv_dir=self.csv_dir, rebuild_indexes=True)
+            stats = import_csv_data(self.db_file, csv_dir=self.csv_dir, rebuild_indexes=True)['partners']
+        self.assertEqual((stats.inserted, stats.duplicates), (0, 2))
+        self.assertEqual(manager.fetchall(index_sql), before)
+
+
+if __name__ == '__main__':
+    unittest.main()